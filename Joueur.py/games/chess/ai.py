@@ -1,11 +1,21 @@
 # This is where you build your AI for the Chess game.
 
-from random import choice
-from time import sleep
+import os
+from functools import partial
+from threading import Thread
+from time import time
 
 # local imports
 from joueur.base_ai import BaseAI
-from games.chess.board import Board, Player, Move
+from games.chess.bitboard import decode_move, generate_legal_moves
+from games.chess.board import Board, Player
+from games.chess.book import DEFAULT_PATH, OpeningBook
+from games.chess.pawns import PawnTable
+from games.chess.rootsplit import RootSplitter
+from games.chess.search import TECHNIQUES, Searcher
+from games.chess.smp import LazySMP
+from games.chess.timeman import TimeManager
+from games.chess.transposition import TranspositionTable
 
 # <<-- Creer-Merge: imports -->> - Code you add between this comment and the end comment will be preserved between Creer re-runs.
 # you can add additional import(s) here
@@ -35,8 +45,61 @@ class AI(BaseAI):
         # our local player representation
         self.local_player = Player(self.board, self.player.color)
 
-        # True when we ditch a new board state, False otherwise
-        self.rerun = False
+        # how many of game.moves have been played on our local board
+        self.synced_moves = len(self.game.moves)
+
+        # search selectivity techniques, each switched off by setting its AI
+        # setting to 0, e.g. --aiSettings lmr=0&null_move=0
+        self.search_options = {name: self.get_setting(name) != "0" for name in TECHNIQUES}
+
+        # transposition table size in MB, set by the tt_mb AI setting
+        tt_mb = int(self.get_setting("tt_mb") or 16)
+
+        # with the threads AI setting above 1, search with that many processes,
+        # either sharing the transposition table or, with the parallel AI
+        # setting set to root, splitting up the root moves
+        threads = int(self.get_setting("threads") or 1)
+
+        if threads > 1 and self.get_setting("parallel") == "root":
+            self.parallel = RootSplitter(threads, tt_mb, self.search_options)
+        elif threads > 1:
+            self.parallel = LazySMP(threads, tt_mb, self.search_options)
+        else:
+            self.parallel = None
+
+        # a single process shares one transposition table and pawn hash
+        # table between every search this game, parallel searchers keep
+        # their own
+        self.tt = None if self.parallel else TranspositionTable(tt_mb)
+        self.pawns = None if self.parallel else PawnTable()
+
+        # a fixed number of seconds to search each move for, set by the
+        # move_time AI setting, otherwise time is budgeted from our clock
+        self.move_time = float(self.get_setting("move_time") or 0)
+
+        # budgets our clock over the rest of the game, the increment and
+        # moves_to_go AI settings describe the time control if known
+        self.time_manager = TimeManager(float(self.get_setting("increment") or 0),
+                                        int(self.get_setting("moves_to_go") or 0))
+
+        # play book moves without searching while the game is in the opening
+        # book named by the book AI setting, or book.bin if it exists; set it
+        # to 0 to always search
+        book_path = self.get_setting("book")
+        if not book_path and os.path.exists(DEFAULT_PATH):
+            book_path = DEFAULT_PATH
+
+        self.book = OpeningBook(book_path) if book_path and book_path != "0" else None
+
+        # search the opponent's expected reply while they think, unless the
+        # ponder AI setting is 0
+        self.ponder = self.get_setting("ponder") != "0"
+        self.ponder_move = None
+        self.expected_reply = None
+        self.ponder_hit = None
+        self.ponder_searcher = None
+        self.ponder_thread = None
+        self.ponder_start = 0.0
 
         # <<-- /Creer-Merge: start -->>
 
@@ -44,7 +107,17 @@ class AI(BaseAI):
         """ This is called every time the game's state updates, so if you are tracking anything you can update it here.
         """
         # <<-- Creer-Merge: game-updated -->> - Code you add between this comment and the end comment will be preserved between Creer re-runs.
-        # replace with your game updated logic
+
+        # as soon as the opponent moves, check if we pondered the right reply
+        if self.ponder_thread and self.ponder_hit is None and len(self.game.moves) > self.synced_moves:
+            move = self.game.moves[self.synced_moves]
+            self.ponder_hit = self.ponder_move == self.board.find_move(
+                move.from_file, move.from_rank, move.to_file, move.to_rank, move.promotion)
+
+            # a wrong guess is worthless, free the CPU for our real search
+            if not self.ponder_hit:
+                self.ponder_searcher.stop()
+
         # <<-- /Creer-Merge: game-updated -->>
 
     def end(self, won, reason):
@@ -55,7 +128,17 @@ class AI(BaseAI):
             reason (str): The human readable string explaining why you won or lost.
         """
         # <<-- Creer-Merge: end -->> - Code you add between this comment and the end comment will be preserved between Creer re-runs.
-        # replace with your end logic
+
+        # a ponder search may still be using the shared table, so it has to
+        # finish before the table is freed
+        self.finish_ponder(0.0, 0.0)
+
+        if self.parallel:
+            self.parallel.close()
+
+        if self.book:
+            self.book.close()
+
         # <<-- /Creer-Merge: end -->>
     def run_turn(self):
         """ This is called every time it is this AI.player's turn.
@@ -65,86 +148,215 @@ class AI(BaseAI):
         """
         # <<-- Creer-Merge: runTurn -->> - Code you add between this comment and the end comment will be preserved between Creer re-runs.
 
-        # if we're not evaluating a new state, don't update local board again
-        if len(self.game.moves) > 0 and not self.rerun:
-            self.update_last_move()
+        # catch up with the move our opponent just made
+        self.update_last_move()
+        self.expected_reply = None
+
+        # the book's moves need no search, so it's checked before anything else
+        local_move = self.book.choose(self.board) if self.book else None
 
-        # create new board state and player
-        new_board = Board(self.board.board2fen())
-        new_local_player = Player(new_board, self.player.color)
+        if local_move is not None:
+            # nothing pondered is needed once we're playing from the book
+            self.finish_ponder(0.0, 0.0)
+            print("Playing from the opening book")
+        else:
+            local_move = self.search_move()
 
-        # select a random move from all possible moves
-        local_move = choice(new_local_player.get_all_moves())
+        self.simulate_move(local_move)
 
-        return self.simulate_move(new_board, new_local_player, local_move)
+        if self.ponder:
+            self.start_ponder()
+
+        return True
 
         # <<-- /Creer-Merge: runTurn -->>
 
     # <<-- Creer-Merge: functions -->> - Code you add between this comment and the end comment will be preserved between Creer re-runs.
 
-    def simulate_move(self, board, local_player, local_move):
-        piece = local_move.piece
-        promotion_type = local_move.promotion
-        x, y = local_move.x, local_move.y
+    def search_move(self):
+        """Searches the local board for the move to play this turn.
 
-        possible_moves = piece.get_moves()
-        old_coord = piece.x, piece.y
-        old_type = piece.type
+        Returns:
+            int: The best packed move found.
+        """
 
-        piece.move(local_move)
+        # budget our time for this move
+        if self.move_time:
+            soft_limit = hard_limit = self.move_time
+        else:
+            soft_limit, hard_limit = self.time_manager.allocate(self.player, self.game, self.board)
 
-        # discard state if we end up in check
-        for p in local_player.pieces.values():
-            if p.type == 'King' and p.in_check():
-                self.rerun = True
-                return False
+        # on a ponder hit the search of this position is already underway
+        searcher = self.finish_ponder(soft_limit, hard_limit)
 
-        # otherwise it's a valid move. find remote piece and move
-        for p in self.player.pieces:
-            if Board.fr2coord(p.file, p.rank) == old_coord:
-                p.move(*Board.coord2fr(x, y), promotion_type)
-                break
+        if searcher:
+            print("Ponder hit")
+        else:
+            # search for the best move within our time budget
+            searcher, search = self.new_search(self.board)
+            search(hard_limit, soft_limit=soft_limit)
 
-        # update board state and player
-        self.board = board
-        self.local_player = local_player
+        searcher.report()
 
-        print("Available moves:")
-        for move in possible_moves:
-            old_file, old_rank = Board.coord2fr(*old_coord)
+        # ponder on the reply the search expects once we've moved
+        self.expected_reply = searcher.ponder_move
 
-            print("{} {} from {}{} to {}".format(
-                piece.color,
-                old_type,
-                old_file, old_rank,
-                move))
+        return searcher.best_move
 
-        print()
+    def new_search(self, board):
+        """Sets up a search of a board, with every process if there are
+        several.
+
+        Args:
+            board: The board to search.
+
+        Returns:
+            (object, function): The Searcher or parallel searcher, which can
+                be stopped or given a new time limit from another thread,
+                and a function taking the time limits that runs the search.
+        """
+
+        if self.parallel:
+            return self.parallel, partial(self.parallel.search, board)
+
+        # age out entries from earlier turns
+        self.tt.new_search()
+
+        searcher = Searcher(board, self.tt, pawns=self.pawns, **self.search_options)
+        return searcher, searcher.search
+
+    def simulate_move(self, local_move):
+        from_file, from_rank, to_file, to_rank, promotion_type = decode_move(local_move)
+        piece = self.board.get_piece(*Board.fr2coord(from_file, from_rank))
 
         print("Selected move:")
-        print("{} {} from {}{} to {}".format(
+        print("{} {} from {}{} to {}{}{}".format(
             piece.color,
-            old_type,
-            old_file, old_rank,
-            local_move))
+            piece.type,
+            from_file, from_rank,
+            to_file, to_rank,
+            ", promotion to " + promotion_type if promotion_type else ""))
 
         print('-'*24)
         print()
 
-        assert self.game.fen == board.board2fen()
+        # the searcher only returns legal moves, so this never needs a rerun
+        self.board.make_move(local_move)
+        self.synced_moves += 1
+
+        # find remote piece and move
+        for p in self.player.pieces:
+            if p.file == from_file and p.rank == from_rank:
+                p.move(to_file, to_rank, promotion_type)
+                break
+
+        assert self.game.fen == self.board.board2fen()
 
-        self.rerun = False
         return True
 
     def update_last_move(self):
-        #move = self.game.moves[-1]
-        #from_x, from_y = Board.fr2coord(move.from_file, move.from_rank)
-        #to_x, to_y = Board.fr2coord(move.to_file, move.to_rank)
-        #piece = self.board.get_piece(from_x, from_y)
+        """Plays the moves made since our last turn on the local board.
 
-        #piece.move(Move(piece, to_x, to_y, move.promotion))
-        self.board = Board(self.game.fen)
-        self.local_player = Player(self.board, self.player.color)
+        Only the new moves are applied, so the board's zobrist key and other
+        incremental state carry over. If a move can't be matched the board is
+        rebuilt from the server's FEN instead.
+        """
+
+        for move in self.game.moves[self.synced_moves:]:
+            local_move = self.board.find_move(move.from_file, move.from_rank,
+                                              move.to_file, move.to_rank,
+                                              move.promotion)
+
+            if local_move is None:
+                print("Could not match move {}, rebuilding board from FEN".format(move.san))
+                self.board = Board(self.game.fen)
+                self.local_player = Player(self.board, self.player.color)
+                break
+
+            self.board.make_move(local_move)
+
+        self.synced_moves = len(self.game.moves)
+
+        # the server draws the game once turns_to_draw more turns pass
+        # without a capture or pawn move
+        self.board.draw_limit = self.board.halfmove_clock + self.game.turns_to_draw
+
+        # debug-only consistency checks, stripped when run with python -O
+        assert self.game.fen == self.board.board2fen(), \
+            "local board {} out of sync with {}".format(self.board.board2fen(), self.game.fen)
+        assert self.board.key == self.board.compute_key()
+
+    def start_ponder(self):
+        """Starts searching the opponent's expected reply on a worker thread.
+
+        The reply is the one our last search expected, so nothing is
+        pondered after a book move. The worker thread searches a copy of the
+        board, with every process if there are several, until it's stopped
+        or given a time limit by finish_ponder, while the main thread keeps
+        servicing the socket.
+        """
+
+        self.ponder_hit = None
+        self.ponder_thread = None
+
+        reply = self.expected_reply
+        if reply is None or reply not in generate_legal_moves(self.board,
+                                                              int(self.board.turn == 'b')):
+            return
+
+        self.ponder_move = reply
+
+        board = self.board.copy()
+        board.make_move(self.ponder_move)
+
+        # no legal replies, the game is over after the ponder move
+        if not generate_legal_moves(board, int(board.turn == 'b')):
+            return
+
+        self.ponder_searcher, search = self.new_search(board)
+        self.ponder_start = time()
+
+        # the limit is set here rather than by the search itself, so one set
+        # by finish_ponder before the thread gets going isn't overwritten
+        self.ponder_searcher.set_time_limit(float("inf"))
+        self.ponder_thread = Thread(target=search, args=(None,))
+        self.ponder_thread.daemon = True
+        self.ponder_thread.start()
+
+    def finish_ponder(self, soft_limit, hard_limit):
+        """Ends the ponder search started on our last turn.
+
+        Args:
+            soft_limit: The soft time limit of this move in seconds.
+            hard_limit: The hard time limit of this move in seconds.
+
+        Returns:
+            (object|None): On a ponder hit the finished ponder searcher,
+                as returned by new_search, whose best move can be played,
+                otherwise None.
+        """
+
+        if not self.ponder_thread:
+            return None
+
+        searcher, thread = self.ponder_searcher, self.ponder_thread
+        self.ponder_thread = self.ponder_searcher = None
+
+        if self.ponder_hit:
+            # time spent pondering counts against the soft limit, so a long
+            # ponder moves almost instantly
+            pondered = time() - self.ponder_start
+
+            if pondered >= soft_limit:
+                searcher.stop()
+            else:
+                searcher.set_time_limit(hard_limit, soft_limit - pondered)
+        else:
+            searcher.stop()
+
+        thread.join()
+
+        return searcher if self.ponder_hit and searcher.best_move is not None else None
 
     def print_current_board(self):
         """Prints the current board using pretty ASCII art
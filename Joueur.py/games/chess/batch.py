@@ -0,0 +1,385 @@
+"""Vectorized evaluation of many positions at once with NumPy.
+
+Positions are encoded from boards into int8 arrays, either (N, 12, 64)
+planes, one per color and piece type in the order color*6 + type, or
+(N, 64) squares holding color*6 + type + 1 for a piece and 0 for an empty
+square. Squares are in board order, a8 first. evaluate_batch scores all N
+positions with array operations only, giving exactly the scores
+evaluation.evaluate gives one board at a time, for tuning and for scoring
+batches of leaves.
+
+NumPy is optional; the rest of the client never imports this module. Run
+from the client's root directory to check and time it against the scalar
+evaluator:
+
+    python -m games.chess.batch                       # 10000 positions
+    python -m games.chess.batch --positions 50000
+"""
+
+import argparse
+import sys
+from random import Random
+from time import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from games.chess.bitboard import (BISHOP, KNIGHT, NOT_FILE_A, NOT_FILE_H, PAWN, QUEEN, RANKS,
+                                   ROOK, generate_legal_moves)
+from games.chess.board import Board
+from games.chess.evaluation import EG_TABLES, MAX_PHASE, MG_TABLES, PHASE_WEIGHTS, evaluate
+from games.chess.pawns import (BACKWARD, DOUBLED, FREE_PASSED_EG, ISOLATED, PASSED_EG,
+                               PASSED_MG)
+
+# (dy, dx) steps of each piece type's moves, sliders repeating theirs
+KNIGHT_STEPS = ((-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1))
+BISHOP_STEPS = ((-1, 1), (1, 1), (1, -1), (-1, -1))
+ROOK_STEPS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("batch evaluation needs NumPy, install it with pip install numpy")
+
+
+def encode(boards, planes=True):
+    """Encodes boards into an array of positions.
+
+    Args:
+        boards: The boards to encode.
+        planes: If True, encode (N, 12, 64) piece planes, otherwise (N, 64)
+            piece codes.
+
+    Returns:
+        (ndarray, ndarray): The int8 positions, and a bool array that is
+            True where white is to move.
+    """
+
+    _require_numpy()
+
+    # each bitboard's bytes unpack least significant bit first, which is
+    # square order
+    data = b"".join(bitboard.to_bytes(8, 'little')
+                    for board in boards for color in board.bitboards for bitboard in color)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+    encoded = bits.reshape(len(boards), 12, 64).astype(np.int8)
+
+    if not planes:
+        encoded = to_squares(encoded)
+
+    white_to_move = np.array([board.turn == 'w' for board in boards], dtype=bool)
+
+    return encoded, white_to_move
+
+
+def to_squares(planes):
+    """Converts (N, 12, 64) piece planes to (N, 64) piece codes.
+
+    Args:
+        planes: The planes to convert.
+
+    Returns:
+        ndarray: The int8 piece code of each square, 0 where empty.
+    """
+
+    _require_numpy()
+
+    codes = np.arange(1, 13, dtype=np.int8)[None, :, None]
+
+    return (planes * codes).sum(axis=1, dtype=np.int8)
+
+
+def to_planes(squares):
+    """Converts (N, 64) piece codes to (N, 12, 64) piece planes.
+
+    Args:
+        squares: The piece codes to convert.
+
+    Returns:
+        ndarray: An int8 plane per color and piece type.
+    """
+
+    _require_numpy()
+
+    codes = np.arange(1, 13, dtype=np.int8)[None, :, None]
+
+    return (squares[:, None, :] == codes).astype(np.int8)
+
+
+def evaluate_batch(positions, white_to_move, mobility_weights=(0, 0)):
+    """Scores many positions at once.
+
+    Args:
+        positions: (N, 12, 64) piece planes or (N, 64) piece codes, as
+            returned by encode.
+        white_to_move: A bool array, True where white is to move.
+        mobility_weights: (middlegame, endgame) centipawns per square of
+            mobility_proxy, for tuning. The scalar evaluator has no
+            mobility term, so scores only match it with the default of 0.
+
+    Returns:
+        ndarray: The int64 score of each position in centipawns from the
+            side to move's point of view, the same as evaluate.
+    """
+
+    _require_numpy()
+
+    if positions.ndim == 3:
+        planes, codes = positions, to_squares(positions)
+    else:
+        planes, codes = None, positions
+
+    # material and piece-square sums, as the board keeps them, looked up by
+    # piece code and square
+    codes = codes.astype(np.intp)
+    mg = _MG_BY_CODE[codes, _SQUARES].sum(axis=1)
+    eg = _EG_BY_CODE[codes, _SQUARES].sum(axis=1)
+    phase = np.minimum(_PHASE_BY_CODE[codes].sum(axis=1), MAX_PHASE)
+
+    # pawn structure on bitboards, scored for white and for black seen from
+    # its side of the board, where its pawns move up as white's do; a byte
+    # swap mirrors a bitboard vertically
+    white_pawns = _bitboard(codes == PAWN + 1)
+    black_pawns = _bitboard(codes == 6 + PAWN + 1)
+    occupied = _bitboard(codes != 0)
+
+    white_mg, white_eg = _pawn_terms(white_pawns, black_pawns, occupied)
+    black_mg, black_eg = _pawn_terms(black_pawns.byteswap(), white_pawns.byteswap(),
+                                     occupied.byteswap())
+    mg += white_mg - black_mg
+    eg += white_eg - black_eg
+
+    if mobility_weights[0] or mobility_weights[1]:
+        mobility = mobility_proxy(codes if planes is None else planes)
+        mg += mobility * mobility_weights[0]
+        eg += mobility * mobility_weights[1]
+
+    score = (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+
+    return np.where(white_to_move, score, -score)
+
+
+def mobility_proxy(positions):
+    """Counts each side's knight, bishop, rook and queen moves.
+
+    Moves are counted to every square a piece attacks that isn't held by its
+    own side, ignoring pins and checks.
+
+    Args:
+        positions: (N, 12, 64) piece planes or (N, 64) piece codes.
+
+    Returns:
+        ndarray: The int64 white count minus the black count.
+    """
+
+    _require_numpy()
+
+    planes = positions if positions.ndim == 3 else to_planes(positions)
+    pieces = planes.astype(bool).reshape(-1, 12, 8, 8)
+    own = (pieces[:, :6].any(axis=1), pieces[:, 6:].any(axis=1))
+    empty = ~(own[0] | own[1])
+    mobility = np.zeros(len(planes), dtype=np.int64)
+
+    for color, sign in ((0, 1), (1, -1)):
+        base = color * 6
+        reachable = ~own[color]
+        diagonal = pieces[:, base + BISHOP] | pieces[:, base + QUEEN]
+        straight = pieces[:, base + ROOK] | pieces[:, base + QUEEN]
+        count = 0
+
+        for step in KNIGHT_STEPS:
+            count += (_shift(pieces[:, base + KNIGHT], step) & reachable).sum(axis=(1, 2))
+
+        # walk each ray a square at a time, only carrying on through empty
+        # squares; rays of different pieces never overlap in one direction
+        for sliders, steps in ((diagonal, BISHOP_STEPS), (straight, ROOK_STEPS)):
+            for step in steps:
+                ray = sliders
+
+                for _ in range(7):
+                    ray = _shift(ray, step)
+                    count += (ray & reachable).sum(axis=(1, 2))
+                    ray = ray & empty
+
+                    if not ray.any():
+                        break
+
+        mobility += sign * count
+
+    return mobility
+
+
+def _shift(squares, step):
+    # moves every set square of (N, 8, 8) arrays by (dy, dx), dropping any
+    # that leave the board
+    dy, dx = step
+    shifted = np.zeros_like(squares)
+    shifted[:, max(dy, 0):8 + min(dy, 0), max(dx, 0):8 + min(dx, 0)] = \
+        squares[:, max(-dy, 0):8 - max(dy, 0), max(-dx, 0):8 - max(dx, 0)]
+
+    return shifted
+
+
+def _bitboard(squares):
+    # (N,) uint64 bitboards from (N, 64) bool arrays
+    packed = np.packbits(squares, axis=1, bitorder='little')
+
+    return np.ascontiguousarray(packed).view('<u8').reshape(len(squares))
+
+
+def _popcount(bitboards):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bitboards).astype(np.int64)
+
+    # older NumPy counts a byte at a time through a table
+    counts = _BYTE_COUNTS[bitboards.view(np.uint8).reshape(-1, 8)]
+
+    return counts.sum(axis=1).reshape(bitboards.shape)
+
+
+def _south_span(bitboards):
+    # every square below a set square on its file, which is behind it for
+    # white
+    span = bitboards << _U8
+    span |= span << _U8
+    span |= span << _U16
+
+    return span | span << _U32
+
+
+def _north_span(bitboards):
+    # every square above a set square on its file
+    span = bitboards >> _U8
+    span |= span >> _U8
+    span |= span >> _U16
+
+    return span | span >> _U32
+
+
+def _beside(bitboards):
+    # the squares on the files either side of each set square
+    return ((bitboards << _U1) & _NOT_FILE_A) | ((bitboards >> _U1) & _NOT_FILE_H)
+
+
+def _pawn_terms(own, enemy, occupied):
+    # pawn_structure for one side's (N,) pawn bitboards, its pawns moving up
+    # the board; returns its middlegame and endgame scores
+    doubled = own & _south_span(own)
+    passed = own & ~doubled & ~_south_span(enemy | _beside(enemy))
+
+    files = own | _south_span(own)
+    files |= _north_span(files)
+    isolated = own & ~_beside(files)
+
+    # own pawns beside or behind on an adjacent file could support an
+    # advance, and enemy pawns attacking the stop square stop it
+    adjacent = _beside(own)
+    supported = adjacent | _north_span(adjacent)
+    enemy_attacks = _beside(enemy) << _U8
+    backward = own & ~isolated & ~supported & (enemy_attacks << _U8)
+
+    free = passed & ~_south_span(occupied)
+
+    mg = (_popcount(doubled) * DOUBLED[0] + _popcount(isolated) * ISOLATED[0]
+          + _popcount(backward) * BACKWARD[0])
+    eg = (_popcount(doubled) * DOUBLED[1] + _popcount(isolated) * ISOLATED[1]
+          + _popcount(backward) * BACKWARD[1])
+
+    # passed pawn bonuses go by rank, row y being rank 7 - y from white's side
+    for y in range(1, 7):
+        rank = _RANKS[y]
+        mg += _popcount(passed & rank) * PASSED_MG[7 - y]
+        eg += (_popcount(passed & rank) * PASSED_EG[7 - y]
+               + _popcount(free & rank) * FREE_PASSED_EG[7 - y])
+
+    return mg, eg
+
+
+if np is not None:
+    # evaluation tables indexed by piece code then square, code 0 being empty
+    _MG_BY_CODE = np.array([[0] * 64] + [MG_TABLES[color][type] for color in range(2)
+                                         for type in range(6)], dtype=np.int64)
+    _EG_BY_CODE = np.array([[0] * 64] + [EG_TABLES[color][type] for color in range(2)
+                                         for type in range(6)], dtype=np.int64)
+    _PHASE_BY_CODE = np.array((0,) + PHASE_WEIGHTS * 2, dtype=np.int64)
+    _SQUARES = np.arange(64)
+
+    _U1, _U8, _U16, _U32 = (np.uint64(n) for n in (1, 8, 16, 32))
+    _NOT_FILE_A = np.uint64(NOT_FILE_A)
+    _NOT_FILE_H = np.uint64(NOT_FILE_H)
+    _RANKS = tuple(np.uint64(rank) for rank in RANKS)
+    _BYTE_COUNTS = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.int64)
+
+
+def random_boards(count, seed=0):
+    """Plays random games to collect positions to evaluate.
+
+    Args:
+        count: The number of boards to collect.
+        seed: Seeds the random moves.
+
+    Returns:
+        list: The boards, copies of every few positions reached.
+    """
+
+    random = Random(seed)
+    boards = []
+
+    while len(boards) < count:
+        board = Board()
+
+        for ply in range(120):
+            moves = generate_legal_moves(board, int(board.turn == 'b'))
+
+            if not moves:
+                break
+
+            board.make_move(random.choice(moves))
+
+            if ply % 8 == 7 and len(boards) < count:
+                boards.append(Board(board.board2fen()))
+
+    return boards
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Checks and times batch evaluation against the scalar evaluator.")
+    parser.add_argument('--positions', type=int, default=10000,
+                        help='how many random positions to evaluate')
+    parser.add_argument('--squares', action='store_true',
+                        help='encode (N, 64) piece codes rather than (N, 12, 64) planes')
+    args = parser.parse_args(argv)
+
+    _require_numpy()
+
+    boards = random_boards(args.positions)
+
+    start = time()
+    positions, white_to_move = encode(boards, planes=not args.squares)
+    encoded = time() - start
+
+    start = time()
+    batch = evaluate_batch(positions, white_to_move)
+    vectorized = time() - start
+
+    start = time()
+    scalar = [evaluate(board) for board in boards]
+    scalar_time = time() - start
+
+    mismatches = int((batch != np.array(scalar)).sum())
+
+    print("encoded {} positions in {:.3f}s".format(len(boards), encoded))
+    print("batch evaluation took {:.3f}s ({:.0f} positions/sec)".format(
+        vectorized, len(boards) / vectorized if vectorized else 0))
+    print("scalar evaluation took {:.3f}s ({:.0f} positions/sec)".format(
+        scalar_time, len(boards) / scalar_time if scalar_time else 0))
+    print("{} positions scored differently".format(mismatches))
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Bench: searches a fixed set of positions to a fixed depth and reports
+search statistics, to measure the effect of search changes.
+
+Run from the client's root directory:
+
+    python -m games.chess.bench                  # search every position
+    python -m games.chess.bench --depth 4
+    python -m games.chess.bench --compare-qgen   # captures-only vs full generation
+    python -m games.chess.bench --disable lmr pvs
+    python -m games.chess.bench --compare-pruning  # each technique on vs off
+"""
+
+import argparse
+import sys
+from time import time
+
+from games.chess.board import Board
+from games.chess.pawns import PawnTable
+from games.chess.search import TECHNIQUES, Searcher
+from games.chess.transposition import TranspositionTable
+
+# positions as (name, FEN), a mix of openings, middlegames and endgames
+POSITIONS = (
+    ("start", Board.DEFAULT_FEN),
+    ("kiwipete",
+     "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("italian",
+     "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+    ("queen's gambit",
+     "rnbqkb1r/ppp2ppp/4pn2/3p4/2PP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4"),
+    ("position 4",
+     "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"),
+    ("position 6",
+     "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("rook endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("pawn endgame", "8/8/4k3/3p4/3P4/4K3/8/8 w - - 0 1"),
+)
+
+
+def run(depth, **options):
+    """Searches every position to a fixed depth.
+
+    Args:
+        depth: The depth to search each position to.
+        options: Keyword arguments passed on to each Searcher.
+
+    Returns:
+        dict: Statistics totalled over every position, keyed by name.
+    """
+
+    totals = {"nodes": 0, "qnodes": 0, "qmoves": 0, "cutoffs": 0,
+              "first_move_cutoffs": 0, "pawn_probes": 0, "pawn_hits": 0, "time": 0.0}
+    pawns = PawnTable()
+
+    for name, fen in POSITIONS:
+        pawns.clear()
+        searcher = Searcher(Board(fen), TranspositionTable(16), pawns=pawns, **options)
+
+        start = time()
+        searcher.search(float("inf"), max_depth=depth)
+        elapsed = time() - start
+
+        totals["nodes"] += searcher.nodes
+        totals["qnodes"] += searcher.qnodes
+        totals["qmoves"] += searcher.qmoves
+        totals["cutoffs"] += searcher.cutoffs
+        totals["first_move_cutoffs"] += searcher.first_move_cutoffs
+        totals["time"] += elapsed
+        totals["pawn_probes"] += pawns.probes
+        totals["pawn_hits"] += pawns.hits
+
+        print("{:<16} {:>9} nodes {:>9} qnodes {:>8.2f}s {:>7.0f} nps {:>6.1%} first move cutoffs"
+              " {:>6.1%} pawn hash hits".format(
+                  name, searcher.nodes, searcher.qnodes, elapsed,
+                  searcher.nodes / elapsed if elapsed else 0,
+                  searcher.first_move_cutoff_rate, pawns.hit_rate))
+
+    print("{:<16} {:>9} nodes {:>9} qnodes {:>8.2f}s {:>7.0f} nps {:>6.1%} first move cutoffs"
+          " {:>6.1%} pawn hash hits".format(
+              "total", totals["nodes"], totals["qnodes"], totals["time"],
+              totals["nodes"] / totals["time"] if totals["time"] else 0,
+              totals["first_move_cutoffs"] / totals["cutoffs"] if totals["cutoffs"] else 0,
+              totals["pawn_hits"] / totals["pawn_probes"] if totals["pawn_probes"] else 0))
+
+    return totals
+
+
+def compare_qgen(depth):
+    """Compares quiescence search with captures-only and full generation.
+
+    Both search the same tree, so the saving is in moves generated and
+    time rather than nodes.
+
+    Args:
+        depth: The depth to search each position to.
+    """
+
+    print("captures-only generation:")
+    staged = run(depth)
+    print()
+    print("full generation, filtered:")
+    full = run(depth, capture_gen=False)
+    print()
+
+    print("quiescence generated {} moves instead of {} ({:.0%} saved) over {} qnodes".format(
+        staged["qmoves"], full["qmoves"],
+        1 - staged["qmoves"] / full["qmoves"] if full["qmoves"] else 0,
+        staged["qnodes"]))
+    print("search took {:.2f}s instead of {:.2f}s ({:.0%} saved)".format(
+        staged["time"], full["time"],
+        1 - staged["time"] / full["time"] if full["time"] else 0))
+
+
+def compare_pruning(depth):
+    """Compares the search with each selectivity technique switched off.
+
+    Args:
+        depth: The depth to search each position to.
+    """
+
+    print("every technique:")
+    baseline = run(depth)
+    results = []
+
+    for technique in TECHNIQUES:
+        print()
+        print("without {}:".format(technique))
+        results.append((technique, run(depth, **{technique: False})))
+
+    print()
+
+    for technique, totals in results:
+        print("{:<12} saves {:>9} nodes ({:>4.0%}) and {:>6.2f}s ({:>4.0%})".format(
+            technique,
+            totals["nodes"] - baseline["nodes"],
+            1 - baseline["nodes"] / totals["nodes"] if totals["nodes"] else 0,
+            totals["time"] - baseline["time"],
+            1 - baseline["time"] / totals["time"] if totals["time"] else 0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Searches a fixed set of positions and reports search statistics.")
+    parser.add_argument('--depth', type=int, default=3, help='the depth to search each position to')
+    parser.add_argument('--compare-qgen', action='store_true',
+                        help='compare captures-only and full move generation in quiescence search')
+    parser.add_argument('--compare-pruning', action='store_true',
+                        help='compare the search with each selectivity technique switched off')
+    parser.add_argument('--disable', nargs='*', default=[], choices=TECHNIQUES,
+                        help='selectivity techniques to switch off')
+    args = parser.parse_args(argv)
+
+    if args.compare_qgen:
+        compare_qgen(args.depth)
+    elif args.compare_pruning:
+        compare_pruning(args.depth)
+    else:
+        run(args.depth, **{technique: False for technique in args.disable})
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""Endgame bitbases: exact win or draw results for king and one piece
+against a lone king.
+
+Each bitbase covers one signature, KPK, KRK or KQK, and holds one bit per
+position, set when the side with the extra piece wins. Positions are
+indexed by the side to move and the squares of the strong king, the extra
+piece and the weak king, with the strong side always playing up the board
+as white does. A black strong side is mirrored vertically when probed. The
+weak side can never win, so a set bit is a win for the strong side and a
+loss for the weak side, and a clear bit is a draw.
+
+Bitbases are generated by retrograde analysis, working back from the
+checkmates, and saved as 64KB files. Run from the client's root
+directory:
+
+    python -m games.chess.bitbase                 # generate every bitbase
+    python -m games.chess.bitbase --probe "<FEN>"
+"""
+
+import argparse
+import os
+import sys
+from time import time
+
+from games.chess.bitboard import (BISHOP, KING, KING_ATTACKS, KNIGHT, PAWN, PAWN_ATTACKS,
+                                   QUEEN, ROOK, WHITE, popcount, queen_attacks, rook_attacks,
+                                   squares)
+from games.chess.board import Board
+
+# probe results, from the side to move's point of view
+WIN, DRAW, LOSS = 1, 0, -1
+
+# the directory bitbase files are saved in and loaded from
+DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bitbases")
+
+# the file of each bitbase, by the type code of the strong side's extra piece;
+# KQK and KRK come first as KPK promotes into them
+SIGNATURES = {QUEEN: "kqk", ROOK: "krk", PAWN: "kpk"}
+
+# no position in a bitbase has a higher game phase, so the search can skip
+# probing anything above it
+MAX_PHASE = 4
+
+# positions per side to move, and the index of the first weak side to move one
+SIDE_SIZE = 1 << 18
+
+
+def index(strong_to_move, strong_king, piece, weak_king):
+    """Gets a position's bit in a bitbase.
+
+    Args:
+        strong_to_move: True if the side with the extra piece is to move.
+        strong_king: The strong king's square, with the strong side as white.
+        piece: The extra piece's square.
+        weak_king: The weak king's square.
+
+    Returns:
+        int: The index of the position's bit.
+    """
+
+    return (not strong_to_move) << 18 | strong_king << 12 | piece << 6 | weak_king
+
+
+def generate(piece_type, promotions=None):
+    """Generates a bitbase by retrograde analysis.
+
+    Every legal position with the weak side to move starts with a count of
+    its legal moves. Checkmates are wins, and each new win is worked back to
+    the positions one move before it: for the strong side, any move into a
+    win wins, while for the weak side a position only wins once every one
+    of its moves has been counted off as leading to a win.
+
+    Args:
+        piece_type: The type code of the strong side's extra piece, PAWN,
+            ROOK or QUEEN.
+        promotions: For KPK, the finished KQK and KRK bitbases, which
+            decide whether promoting the pawn wins.
+
+    Returns:
+        bytes: The bitbase, one bit per index, least significant bit first.
+    """
+
+    pawn = piece_type == PAWN
+
+    # squares the strong side attacks with the weak king lifted off the
+    # board, so sliders see through it, by strong king and piece square
+    attacked = [0] * 4096
+    for king in range(64):
+        for piece in range(64):
+            if piece == king:
+                continue
+
+            if pawn:
+                piece_attacks = PAWN_ATTACKS[WHITE][piece]
+            elif piece_type == ROOK:
+                piece_attacks = rook_attacks(piece, 1 << king)
+            else:
+                piece_attacks = queen_attacks(piece, 1 << king)
+
+            attacked[king << 6 | piece] = KING_ATTACKS[king] | piece_attacks
+
+    # pawns never stand on the first or last rank
+    piece_squares = range(8, 56) if pawn else range(64)
+
+    wins = bytearray(2 * SIDE_SIZE)
+
+    # legal moves not yet known to lose, indexed like wins but only kept for
+    # positions with the weak side to move
+    moves_left = bytearray(2 * SIDE_SIZE)
+    found = []
+
+    for king in range(64):
+        for piece in piece_squares:
+            if piece == king:
+                continue
+
+            strong = attacked[king << 6 | piece]
+            blocked = 1 << king | 1 << piece
+
+            for weak in range(64):
+                if blocked >> weak & 1 or KING_ATTACKS[king] >> weak & 1:
+                    continue
+
+                # the weak king may take the piece unless it's defended
+                moves = KING_ATTACKS[weak] & ~strong & ~(1 << king)
+                weak_index = SIDE_SIZE | king << 12 | piece << 6 | weak
+                moves_left[weak_index] = popcount(moves)
+
+                if not moves and strong >> weak & 1:
+                    wins[weak_index] = 1
+                    found.append(weak_index)
+
+                # a pawn about to promote wins if either promotion does
+                if (pawn and piece < 16 and not strong >> weak & 1
+                        and not blocked >> (piece - 8) & 1 and weak != piece - 8):
+                    promoted = SIDE_SIZE | king << 12 | (piece - 8) << 6 | weak
+
+                    if any(table[promoted >> 3] >> (promoted & 7) & 1 for table in promotions):
+                        strong_index = king << 12 | piece << 6 | weak
+                        wins[strong_index] = 1
+                        found.append(strong_index)
+
+    while found:
+        position = found.pop()
+        king, piece, weak = position >> 12 & 63, position >> 6 & 63, position & 63
+        occupied = 1 << king | 1 << piece | 1 << weak
+
+        if position < SIDE_SIZE:
+            # the weak king moved here; a weak position wins once none of its
+            # moves are left to escape by
+            for origin in squares(KING_ATTACKS[weak] & ~occupied & ~KING_ATTACKS[king]):
+                before = SIDE_SIZE | king << 12 | piece << 6 | origin
+
+                if not wins[before]:
+                    moves_left[before] -= 1
+
+                    if not moves_left[before]:
+                        wins[before] = 1
+                        found.append(before)
+
+            continue
+
+        # the strong side moved here, with its king or its piece
+        before = []
+        for origin in squares(KING_ATTACKS[king] & ~occupied):
+            before.append((origin, piece))
+
+        if not pawn:
+            for origin in squares((rook_attacks if piece_type == ROOK else queen_attacks)(
+                    piece, occupied) & ~occupied):
+                before.append((king, origin))
+        elif piece + 8 < 56 and not occupied >> (piece + 8) & 1:
+            before.append((king, piece + 8))
+
+            # a double push from the second rank
+            if piece >> 3 == 4 and not occupied >> (piece + 16) & 1:
+                before.append((king, piece + 16))
+
+        for strong_king, strong_piece in before:
+            # the weak side, not to move, can't be left in check
+            if (KING_ATTACKS[strong_king] >> weak & 1
+                    or attacked[strong_king << 6 | strong_piece] >> weak & 1):
+                continue
+
+            strong_index = strong_king << 12 | strong_piece << 6 | weak
+
+            if not wins[strong_index]:
+                wins[strong_index] = 1
+                found.append(strong_index)
+
+    # pack eight positions to a byte
+    packed = bytearray(len(wins) >> 3)
+    for position in range(0, len(wins), 8):
+        byte = 0
+
+        for bit in range(8):
+            byte |= wins[position + bit] << bit
+
+        packed[position >> 3] = byte
+
+    return bytes(packed)
+
+
+def generate_all(directory=DIRECTORY):
+    """Generates every bitbase and saves it to a file.
+
+    Args:
+        directory: The directory to save the files in.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    tables = {}
+
+    for piece_type, name in SIGNATURES.items():
+        start = time()
+        promotions = (tables[QUEEN], tables[ROOK]) if piece_type == PAWN else None
+        tables[piece_type] = generate(piece_type, promotions)
+
+        with open(os.path.join(directory, name + ".bin"), 'wb') as file:
+            file.write(tables[piece_type])
+
+        wins = sum(bin(byte).count('1') for byte in tables[piece_type][:SIDE_SIZE >> 3])
+        print("{}: {} wins with the strong side to move, generated in {:.1f}s".format(
+            name.upper(), wins, time() - start))
+
+
+def load(directory=DIRECTORY):
+    """Loads every bitbase file found.
+
+    Args:
+        directory: The directory the files were saved in.
+
+    Returns:
+        dict: Each bitbase found, keyed by the type code of the strong
+            side's extra piece.
+    """
+
+    tables = {}
+
+    for piece_type, name in SIGNATURES.items():
+        path = os.path.join(directory, name + ".bin")
+
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                tables[piece_type] = file.read()
+
+    return tables
+
+
+_tables = load()
+
+
+def probe(board):
+    """Looks up the result of a board with at most three pieces.
+
+    Args:
+        board: The board to look up, read through its piece lists.
+
+    Returns:
+        (int|None): WIN, DRAW or LOSS for the side to move, or None if the
+            position isn't covered by a loaded bitbase.
+    """
+
+    white, black = board.pieces["White"].values(), board.pieces["Black"].values()
+    count = len(white) + len(black)
+
+    # bare kings, or a lone minor piece, can't mate
+    if count == 2:
+        return DRAW
+
+    if count != 3:
+        return None
+
+    strong, weak = (white, black) if len(white) == 2 else (black, white)
+    strong_king = piece = None
+
+    for strong_piece in strong:
+        if strong_piece.type_code == KING:
+            strong_king = strong_piece
+        else:
+            piece = strong_piece
+
+    if piece.type_code in (KNIGHT, BISHOP):
+        return DRAW
+
+    table = _tables.get(piece.type_code)
+    if table is None:
+        return None
+
+    weak_king = next(iter(weak))
+
+    # the strong side is looked up as white, so black is mirrored
+    flip = 56 if piece.color_code != WHITE else 0
+    strong_to_move = board.turn == ('w' if piece.color_code == WHITE else 'b')
+
+    position = index(strong_to_move,
+                     (strong_king.y*8 + strong_king.x) ^ flip,
+                     (piece.y*8 + piece.x) ^ flip,
+                     (weak_king.y*8 + weak_king.x) ^ flip)
+
+    if not table[position >> 3] >> (position & 7) & 1:
+        return DRAW
+
+    return WIN if strong_to_move else LOSS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates and probes endgame bitbases.")
+    parser.add_argument('--probe', metavar='FEN', help='look up a position instead of generating')
+    parser.add_argument('--directory', default=DIRECTORY, help='where bitbase files are kept')
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        global _tables
+        _tables = load(args.directory)
+
+        result = probe(Board(args.probe))
+        print({WIN: "win", DRAW: "draw", LOSS: "loss", None: "not in a bitbase"}[result])
+    else:
+        generate_all(args.directory)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,683 @@
+"""Bitboard move generation for the local board.
+
+Squares are indexed 0-63 in the same order the board's 2d list is laid out:
+a8 is square 0, h8 is square 7 and h1 is square 63, so a square's index is
+simply y*8 + x. Bit n of a bitboard is set when square n is occupied.
+
+Moves are packed into 16 bits as from | to << 6 | flag << 12 and generated
+into array('H') move lists.
+"""
+
+from array import array
+
+# piece type codes
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+# color codes
+WHITE, BLACK = range(2)
+
+# map piece type and color codes to the names used by the rest of the client
+PIECE_TYPES = ("Pawn", "Knight", "Bishop", "Rook", "Queen", "King")
+COLORS = ("White", "Black")
+TYPE_CODES = {name: code for code, name in enumerate(PIECE_TYPES)}
+COLOR_CODES = {name: code for code, name in enumerate(COLORS)}
+
+# pieces a pawn may promote to, in the same order as Piece.PROMOTION_OPTIONS
+PROMOTION_TYPES = ("Knight", "Bishop", "Rook", "Queen")
+
+# move flags, stored in the top 4 bits of a packed move. Promotions use
+# PROMOTION plus the index of the new type in PROMOTION_TYPES
+QUIET, DOUBLE_PUSH, CASTLE, EN_PASSANT, PROMOTION = 0, 1, 2, 3, 4
+
+# algebraic names of each square, e.g. SQUARE_NAMES[52] == "e2"
+SQUARE_NAMES = tuple("abcdefgh"[sq & 7] + str(8 - (sq >> 3)) for sq in range(64))
+
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL ^ FILE_A
+NOT_FILE_H = FULL ^ FILE_H
+
+# ranks are indexed by y, so RANKS[0] is rank 8 and RANKS[7] is rank 1
+RANKS = tuple(0xFF << (8*y) for y in range(8))
+
+
+def _build_step_table(offsets):
+    """Builds a table of the squares reachable from each square by one step.
+
+    Args:
+        offsets: (dx, dy) pairs describing every step the piece can make.
+
+    Returns:
+        tuple: A bitboard of reachable squares for each of the 64 squares.
+    """
+
+    table = []
+
+    for sq in range(64):
+        x, y = sq & 7, sq >> 3
+        bb = 0
+
+        for dx, dy in offsets:
+            if 0 <= x+dx < 8 and 0 <= y+dy < 8:
+                bb |= 1 << ((y+dy)*8 + x+dx)
+
+        table.append(bb)
+
+    return tuple(table)
+
+
+def _build_ray_table(dx, dy):
+    """Builds a table of the squares along a ray from each square.
+
+    Args:
+        dx: The x step of the ray.
+        dy: The y step of the ray.
+
+    Returns:
+        tuple: A bitboard of the ray (excluding its origin) for each square.
+    """
+
+    table = []
+
+    for sq in range(64):
+        x, y = (sq & 7) + dx, (sq >> 3) + dy
+        bb = 0
+
+        while 0 <= x < 8 and 0 <= y < 8:
+            bb |= 1 << (y*8 + x)
+            x, y = x+dx, y+dy
+
+        table.append(bb)
+
+    return tuple(table)
+
+
+KNIGHT_ATTACKS = _build_step_table((
+    (1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)))
+
+KING_ATTACKS = _build_step_table((
+    (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1)))
+
+# squares attacked by a pawn of the given color standing on each square
+PAWN_ATTACKS = (
+    _build_step_table(((-1, -1), (1, -1))),  # white pawns attack north
+    _build_step_table(((-1, 1), (1, 1)))     # black pawns attack south
+)
+
+# sliding rays as (table, positive) pairs, where positive rays run towards
+# higher square indices so their nearest blocker is the least significant bit
+ROOK_RAYS = tuple(
+    (_build_ray_table(dx, dy), dy*8 + dx > 0)
+    for dx, dy in ((0, -1), (1, 0), (0, 1), (-1, 0)))
+
+BISHOP_RAYS = tuple(
+    (_build_ray_table(dx, dy), dy*8 + dx > 0)
+    for dx, dy in ((1, -1), (1, 1), (-1, 1), (-1, -1)))
+
+
+def _slide(sq, occupied, rays):
+    attacks = 0
+
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+
+            # cut the ray off behind the nearest blocker
+            ray ^= table[blocker]
+
+        attacks |= ray
+
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    """Gets the squares a rook on sq attacks.
+
+    Args:
+        sq: The rook's square.
+        occupied: A bitboard of every occupied square.
+
+    Returns:
+        int: A bitboard of attacked squares, including the first blocker
+            along each ray.
+    """
+
+    return _slide(sq, occupied, ROOK_RAYS)
+
+
+def bishop_attacks(sq, occupied):
+    """Gets the squares a bishop on sq attacks.
+
+    Args:
+        sq: The bishop's square.
+        occupied: A bitboard of every occupied square.
+
+    Returns:
+        int: A bitboard of attacked squares, including the first blocker
+            along each ray.
+    """
+
+    return _slide(sq, occupied, BISHOP_RAYS)
+
+
+def queen_attacks(sq, occupied):
+    """Gets the squares a queen on sq attacks.
+
+    Args:
+        sq: The queen's square.
+        occupied: A bitboard of every occupied square.
+
+    Returns:
+        int: A bitboard of attacked squares.
+    """
+
+    return _slide(sq, occupied, ROOK_RAYS) | _slide(sq, occupied, BISHOP_RAYS)
+
+
+def squares(bb):
+    """Iterates over the set squares of a bitboard, lowest first.
+
+    Args:
+        bb: The bitboard.
+
+    Yields:
+        int: The index of each set square.
+    """
+
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def encode_move(from_sq, to_sq, flag=QUIET):
+    """Packs a move into 16 bits.
+
+    Args:
+        from_sq: The square moved from.
+        to_sq: The square moved to.
+        flag: One of the move flags, or PROMOTION plus a promotion index.
+
+    Returns:
+        int: The packed move.
+    """
+
+    return from_sq | to_sq << 6 | flag << 12
+
+
+def decode_move(move):
+    """Unpacks a move into the coordinates used by the game server.
+
+    Args:
+        move: The packed move.
+
+    Returns:
+        (str, int, str, int, str): The from file and rank, the to file and
+            rank, and the promotion type or an empty string, ready for
+            Piece.move on the server's piece.
+    """
+
+    from_sq, to_sq, flag = move & 63, move >> 6 & 63, move >> 12
+
+    return ("abcdefgh"[from_sq & 7], 8 - (from_sq >> 3),
+            "abcdefgh"[to_sq & 7], 8 - (to_sq >> 3),
+            PROMOTION_TYPES[flag - PROMOTION] if flag >= PROMOTION else "")
+
+
+def popcount(bb):
+    """Counts the set squares of a bitboard.
+
+    Args:
+        bb: The bitboard.
+
+    Returns:
+        int: The number of set squares.
+    """
+
+    return bin(bb).count('1')
+
+
+def square_bit(x, y):
+    """Gets the bitboard with only the square at x, y set.
+
+    Args:
+        x: The x coordinate.
+        y: The y coordinate.
+
+    Returns:
+        int: The single square bitboard.
+    """
+
+    return 1 << (y*8 + x)
+
+
+def _build_between_table():
+    """Builds a table of the squares strictly between two aligned squares.
+
+    Returns:
+        tuple: For each square a tuple of 64 bitboards, holding the squares
+            between the two if they share a rank, file or diagonal and 0
+            otherwise.
+    """
+
+    table = [[0]*64 for sq in range(64)]
+
+    for rays in (ROOK_RAYS, BISHOP_RAYS):
+        for ray_table, positive in rays:
+            for sq in range(64):
+                between = 0
+
+                for to in (squares(ray_table[sq]) if positive
+                           else reversed(list(squares(ray_table[sq])))):
+                    table[sq][to] = between
+                    between |= 1 << to
+
+    return tuple(tuple(row) for row in table)
+
+
+BETWEEN = _build_between_table()
+
+# castling as (right, king from, king to, rook from, squares that must be
+# empty, squares the king passes through that must not be attacked)
+CASTLES = (
+    (
+        ('K', 60, 62, 63, 0x6 << 60, 0x6 << 60),
+        ('Q', 60, 58, 56, 0xE << 56, 0xC << 56)
+    ),
+    (
+        ('k', 4, 6, 7, 0x6 << 4, 0x6 << 4),
+        ('q', 4, 2, 0, 0xE, 0xC)
+    )
+)
+
+
+def attackers_to(board, sq, color, occupied):
+    """Finds every piece of one color attacking a square.
+
+    Args:
+        board: The board instance, with up to date bitboards.
+        sq: The square being attacked.
+        color: The color code of the attacking side.
+        occupied: The occupancy to slide through, which may differ from the
+            board's to look through pieces that are about to move.
+
+    Returns:
+        int: A bitboard of the attacking pieces.
+    """
+
+    pieces = board.bitboards[color]
+    queens = pieces[QUEEN]
+
+    return ((KNIGHT_ATTACKS[sq] & pieces[KNIGHT])
+            | (KING_ATTACKS[sq] & pieces[KING])
+            | (PAWN_ATTACKS[color ^ 1][sq] & pieces[PAWN])
+            | (_slide(sq, occupied, BISHOP_RAYS) & (pieces[BISHOP] | queens))
+            | (_slide(sq, occupied, ROOK_RAYS) & (pieces[ROOK] | queens)))
+
+
+def is_attacked(board, sq, color):
+    """Checks if a square is attacked by one color.
+
+    Looks outward from the square for each kind of attacker in turn, so no
+    moves are generated and the cheap leaper tests can return early.
+
+    Args:
+        board: The board instance, with up to date bitboards.
+        sq: The square being attacked.
+        color: The color code of the attacking side.
+
+    Returns:
+        bool: True if any piece of color attacks sq, False otherwise.
+    """
+
+    pieces = board.bitboards[color]
+
+    if (KNIGHT_ATTACKS[sq] & pieces[KNIGHT]
+            or PAWN_ATTACKS[color ^ 1][sq] & pieces[PAWN]
+            or KING_ATTACKS[sq] & pieces[KING]):
+        return True
+
+    occupied = board.occupancy[0] | board.occupancy[1]
+    queens = pieces[QUEEN]
+
+    return bool(_slide(sq, occupied, ROOK_RAYS) & (pieces[ROOK] | queens)
+                or _slide(sq, occupied, BISHOP_RAYS) & (pieces[BISHOP] | queens))
+
+
+# piece values used to resolve exchanges, indexed by piece type code
+SEE_VALUES = (100, 320, 330, 500, 900, 20000)
+
+
+def see(board, move):
+    """Statically evaluates the exchange started by a capture.
+
+    Both sides recapture on the target square with their least valuable
+    attacker, including sliders x-raying through pieces that have already
+    captured, and either side may stop recapturing when that would lose
+    material.
+    Pins are ignored. Only attack lookups are used, so no moves are
+    generated or played.
+
+    Args:
+        board: The board instance, with up to date bitboards.
+        move: The packed capture or promotion starting the exchange.
+
+    Returns:
+        int: The material the moving side gains, which is negative for a
+            losing capture.
+    """
+
+    from_sq, to_sq, flag = move & 63, move >> 6 & 63, move >> 12
+    bitboards = board.bitboards
+    occupied = board.occupancy[WHITE] | board.occupancy[BLACK]
+    color = WHITE if board.occupancy[WHITE] >> from_sq & 1 else BLACK
+
+    attacker = 0
+    while not bitboards[color][attacker] >> from_sq & 1:
+        attacker += 1
+
+    victim = 0
+    for type in range(6):
+        if bitboards[color ^ 1][type] >> to_sq & 1:
+            victim = SEE_VALUES[type]
+            break
+
+    if flag == EN_PASSANT:
+        victim = SEE_VALUES[PAWN]
+        occupied ^= 1 << (to_sq + (8 if color == WHITE else -8))
+
+    # a promoting pawn stands on the square as the piece it promotes to
+    on_square = SEE_VALUES[attacker]
+    if flag >= PROMOTION:
+        on_square = SEE_VALUES[KNIGHT + flag - PROMOTION]
+        victim += on_square - SEE_VALUES[PAWN]
+
+    gains = [victim]
+    from_bit = 1 << from_sq
+
+    while True:
+        # speculatively score the piece on the square being recaptured
+        gains.append(on_square - gains[-1])
+
+        occupied ^= from_bit
+        color ^= 1
+
+        # recomputing with the capturer gone reveals any x-ray attackers
+        attackers = attackers_to(board, to_sq, color, occupied) & occupied
+        if not attackers:
+            break
+
+        for type in range(6):
+            candidates = attackers & bitboards[color][type]
+
+            if candidates:
+                break
+
+        # the king can only recapture if nothing can take it back
+        if type == KING and attackers_to(board, to_sq, color ^ 1, occupied) & occupied:
+            break
+
+        from_bit = candidates & -candidates
+        on_square = SEE_VALUES[type]
+
+    # the last entry was never played, so resolve from the one before it
+    gains.pop()
+
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+
+    return gains[0]
+
+
+def _en_passant_square(board):
+    if board.en_passant == '-':
+        return -1
+
+    return SQUARE_NAMES.index(board.en_passant)
+
+
+# promotion flags already shifted into place, one per promotion type
+PROMOTION_FLAGS = tuple((PROMOTION + i) << 12 for i in range(len(PROMOTION_TYPES)))
+
+
+def _pawn_moves(append, pawns, color, empty, enemy, mask):
+    """Generates pawn pushes and captures set-wise.
+
+    Args:
+        append: Called with each packed move.
+        pawns: A bitboard of the pawns to move.
+        color: The pawns' color code.
+        empty: A bitboard of empty squares.
+        enemy: A bitboard of enemy pieces.
+        mask: A bitboard of squares the pawns may land on.
+    """
+
+    if color == WHITE:
+        single = (pawns >> 8) & empty
+        double = ((single & RANKS[5]) >> 8) & empty
+        captures = (
+            (((pawns & NOT_FILE_A) >> 9) & enemy, 9),
+            (((pawns & NOT_FILE_H) >> 7) & enemy, 7)
+        )
+        forward, promotion_rank = 8, RANKS[0]
+    else:
+        single = (pawns << 8) & empty
+        double = ((single & RANKS[2]) << 8) & empty
+        captures = (
+            (((pawns & NOT_FILE_H) << 9) & enemy, -9),
+            (((pawns & NOT_FILE_A) << 7) & enemy, -7)
+        )
+        forward, promotion_rank = -8, RANKS[7]
+
+    for bb, offset in ((single, forward),) + captures:
+        bb &= mask
+
+        for to in squares(bb & ~promotion_rank):
+            append((to+offset) | to << 6)
+
+        for to in squares(bb & promotion_rank):
+            move = (to+offset) | to << 6
+
+            for flag in PROMOTION_FLAGS:
+                append(move | flag)
+
+    for to in squares(double & mask):
+        append((to + 2*forward) | to << 6 | DOUBLE_PUSH << 12)
+
+
+def generate_moves(board, color):
+    """Generates every pseudo-legal move for one side of a board.
+
+    Moves that leave the mover's own king in check are included, matching
+    the behaviour of Piece.get_moves, but castling out of or through check
+    is not.
+
+    Args:
+        board: The board instance, with up to date bitboards.
+        color: The color code of the side to generate moves for.
+
+    Returns:
+        array: The packed moves.
+    """
+
+    moves = array('H')
+    append = moves.append
+
+    own_pieces = board.bitboards[color]
+    own = board.occupancy[color]
+    enemy = board.occupancy[color ^ 1]
+    occupied = own | enemy
+    targets = FULL ^ own
+
+    _pawn_moves(append, own_pieces[PAWN], color, FULL ^ occupied, enemy, FULL)
+
+    ep = _en_passant_square(board)
+
+    if ep >= 0:
+        for sq in squares(PAWN_ATTACKS[color ^ 1][ep] & own_pieces[PAWN]):
+            append(sq | ep << 6 | EN_PASSANT << 12)
+
+    for sq in squares(own_pieces[KNIGHT]):
+        for to in squares(KNIGHT_ATTACKS[sq] & targets):
+            append(sq | to << 6)
+
+    for sq in squares(own_pieces[BISHOP]):
+        for to in squares(_slide(sq, occupied, BISHOP_RAYS) & targets):
+            append(sq | to << 6)
+
+    for sq in squares(own_pieces[ROOK]):
+        for to in squares(_slide(sq, occupied, ROOK_RAYS) & targets):
+            append(sq | to << 6)
+
+    for sq in squares(own_pieces[QUEEN]):
+        for to in squares(queen_attacks(sq, occupied) & targets):
+            append(sq | to << 6)
+
+    for sq in squares(own_pieces[KING]):
+        for to in squares(KING_ATTACKS[sq] & targets):
+            append(sq | to << 6)
+
+        for right, king_from, king_to, rook_from, between, path in CASTLES[color]:
+            if (right in board.castling and sq == king_from
+                    and own_pieces[ROOK] >> rook_from & 1
+                    and not occupied & between
+                    and not any(is_attacked(board, sq, color ^ 1)
+                                for sq in squares(path | 1 << king_from))):
+                append(king_from | king_to << 6 | CASTLE << 12)
+
+    return moves
+
+
+def generate_legal_moves(board, color, captures_only=False):
+    """Generates every legal move for one side of a board.
+
+    Pinned pieces are restricted to the line between their king and the
+    pinning piece, and when in check only moves that capture the checker,
+    block it or move the king are generated, so no move needs to be played
+    to be tested.
+
+    Args:
+        board: The board instance, with up to date bitboards.
+        color: The color code of the side to generate moves for.
+        captures_only: If True, only captures and promotions are generated,
+            for quiescence search.
+
+    Returns:
+        array: The packed moves.
+    """
+
+    moves = array('H')
+    append = moves.append
+
+    own_pieces = board.bitboards[color]
+    enemy_pieces = board.bitboards[color ^ 1]
+    own = board.occupancy[color]
+    enemy = board.occupancy[color ^ 1]
+    occupied = own | enemy
+    empty = FULL ^ occupied
+    targets = enemy if captures_only else FULL ^ own
+
+    # the only quiet moves left are pushes onto the last rank
+    if captures_only:
+        empty &= RANKS[0] if color == WHITE else RANKS[7]
+
+    king_bb = own_pieces[KING]
+    king = king_bb.bit_length() - 1
+
+    # king moves, sliding through the king's own square so it can't step
+    # back along the line of a checking slider
+    without_king = occupied ^ king_bb
+
+    for to in squares(KING_ATTACKS[king] & targets):
+        if not attackers_to(board, to, color ^ 1, without_king):
+            append(king | to << 6)
+
+    checkers = attackers_to(board, king, color ^ 1, occupied)
+
+    # in double check only the king can move
+    if checkers & (checkers - 1):
+        return moves
+
+    # squares other pieces must land on: anywhere, or when in check the
+    # checker and the squares between it and the king
+    if checkers:
+        check_mask = checkers | BETWEEN[king][checkers.bit_length() - 1]
+    else:
+        check_mask = FULL
+
+    if not checkers and not captures_only:
+        for right, king_from, king_to, rook_from, between, path in CASTLES[color]:
+            if (right in board.castling and king == king_from
+                    and own_pieces[ROOK] >> rook_from & 1
+                    and not occupied & between
+                    and not any(is_attacked(board, sq, color ^ 1)
+                                for sq in squares(path))):
+                append(king_from | king_to << 6 | CASTLE << 12)
+
+    # find pinned pieces and the line each may move along
+    pinned = 0
+    pin_lines = {}
+    snipers = ((_slide(king, enemy, ROOK_RAYS)
+                & (enemy_pieces[ROOK] | enemy_pieces[QUEEN]))
+               | (_slide(king, enemy, BISHOP_RAYS)
+                  & (enemy_pieces[BISHOP] | enemy_pieces[QUEEN])))
+
+    for sniper in squares(snipers):
+        between = BETWEEN[king][sniper] & occupied
+
+        if between and not between & (between - 1) and between & own:
+            pinned |= between
+            pin_lines[between.bit_length() - 1] = BETWEEN[king][sniper] | 1 << sniper
+
+    pawns = own_pieces[PAWN]
+    _pawn_moves(append, pawns & ~pinned, color, empty, enemy, check_mask)
+
+    for sq in squares(pawns & pinned):
+        _pawn_moves(append, 1 << sq, color, empty, enemy, check_mask & pin_lines[sq])
+
+    ep = _en_passant_square(board)
+
+    if ep >= 0:
+        captured = ep + (8 if color == WHITE else -8)
+
+        # en passant can answer a check by the pawn that just moved
+        if check_mask >> ep & 1 or check_mask >> captured & 1:
+            for sq in squares(PAWN_ATTACKS[color ^ 1][ep] & pawns):
+                # removing both pawns may expose the king along a rank, so
+                # test the resulting position directly
+                after = occupied ^ (1 << sq) ^ (1 << captured) ^ (1 << ep)
+                queens = enemy_pieces[QUEEN]
+
+                if not ((_slide(king, after, ROOK_RAYS)
+                         & (enemy_pieces[ROOK] | queens))
+                        or (_slide(king, after, BISHOP_RAYS)
+                            & (enemy_pieces[BISHOP] | queens))):
+                    append(sq | ep << 6 | EN_PASSANT << 12)
+
+    targets &= check_mask
+
+    for sq in squares(own_pieces[KNIGHT] & ~pinned):
+        for to in squares(KNIGHT_ATTACKS[sq] & targets):
+            append(sq | to << 6)
+
+    for type, attacks in ((BISHOP, BISHOP_RAYS), (ROOK, ROOK_RAYS)):
+        for sq in squares(own_pieces[type]):
+            mask = pin_lines[sq] & targets if pinned >> sq & 1 else targets
+
+            for to in squares(_slide(sq, occupied, attacks) & mask):
+                append(sq | to << 6)
+
+    for sq in squares(own_pieces[QUEEN]):
+        mask = pin_lines[sq] & targets if pinned >> sq & 1 else targets
+
+        for to in squares(queen_attacks(sq, occupied) & mask):
+            append(sq | to << 6)
+
+    return moves
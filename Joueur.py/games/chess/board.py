@@ -1,6 +1,22 @@
 from string import ascii_lowercase
 from re import sub
 
+from games.chess.bitboard import (BLACK, CASTLE, COLOR_CODES, COLORS, DOUBLE_PUSH,
+                                   EN_PASSANT, KNIGHT, PAWN, PIECE_TYPES, PROMOTION,
+                                   PROMOTION_TYPES, SQUARE_NAMES, TYPE_CODES, WHITE,
+                                   decode_move, encode_move, generate_legal_moves,
+                                   generate_moves, is_attacked, squares)
+from games.chess.evaluation import EG_TABLES, MG_TABLES, PHASE_WEIGHTS
+from games.chess.zobrist import (PIECE_KEYS, SIDE_KEY, castling_key,
+                                 en_passant_key)
+
+
+# castling rights lost when a piece moves from or to each starting square
+CASTLING_LOST = {60: 'KQ', 63: 'K', 56: 'Q', 4: 'kq', 7: 'k', 0: 'q'}
+
+# the halfmove clock value at which the game is drawn, by the fifty-move rule
+FIFTY_MOVES = 100
+
 
 class Board:
     """Represents a local board instance."""
@@ -34,6 +50,26 @@ class Board:
         # represent our board as a 2d list, pieces as a dictionary
         self._board, self.pieces = self.fen2board(fen[0])
 
+        # bitboards indexed by color code then piece type code, kept in sync
+        # with the 2d list by _toggle
+        self.bitboards = [[0]*6, [0]*6]
+        self.occupancy = [0, 0]
+
+        # zobrist key of the position, and of its pawns alone for the pawn
+        # hash table, also kept up to date by _toggle
+        self.key = 0
+        self.pawn_key = 0
+
+        # white-relative middlegame and endgame evaluation sums and the game
+        # phase, also kept up to date by _toggle
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+
+        for color in self.pieces.values():
+            for piece in color.values():
+                self._toggle(piece, piece.x, piece.y)
+
         # other FEN fields
         self.turn = fen[1]
         self.castling = fen[2]
@@ -41,6 +77,16 @@ class Board:
         self.halfmove_clock = int(fen[4])
         self.fullmove_counter = int(fen[5])
 
+        self.key = self.compute_key()
+
+        # keys of the positions before each move played on this board, pushed
+        # by make_move and popped by unmake_move
+        self.key_history = []
+
+        # the halfmove clock value at which the game is drawn; the AI sets it
+        # from the server's Game.turns_to_draw
+        self.draw_limit = FIFTY_MOVES
+
     def get_piece(self, x, y):
         """Retrieves a piece from the board.
 
@@ -71,6 +117,7 @@ class Board:
 
         # remove our piece from original position
         self._board[piece.y][piece.x] = None
+        self._toggle(piece, piece.x, piece.y)
 
         # remove enemy piece if captured
         if self.get_piece(x, y):
@@ -78,6 +125,7 @@ class Board:
 
         # update board to new piece position
         self._board[y][x] = piece
+        self._toggle(piece, x, y)
 
         # update piece x and y values
         piece.x, piece.y = x, y
@@ -98,10 +146,385 @@ class Board:
 
         # remove from board
         self._board[y][x] = None
+        self._toggle(piece, x, y)
 
         # reset the halfmove clock
         self.halfmove_clock = 0
 
+    def make_move(self, move):
+        """Plays a move on this board in place.
+
+        Args:
+            move: The packed move to play, as generated by the bitboard
+                move generators or Move.pack.
+
+        Returns:
+            tuple: The state needed by unmake_move to take the move back.
+        """
+
+        from_sq, to_sq, flag = move & 63, move >> 6 & 63, move >> 12
+        from_x, from_y = from_sq & 7, from_sq >> 3
+        to_x, to_y = to_sq & 7, to_sq >> 3
+        board = self._board
+
+        piece = board[from_y][from_x]
+        captured = board[to_y][to_x]
+        rook_has_moved = False
+
+        # a pawn captured en passant sits beside the capturing pawn
+        if flag == EN_PASSANT:
+            captured = board[from_y][to_x]
+
+        if flag == CASTLE:
+            rook_has_moved = board[to_y][7 if to_x == 6 else 0].has_moved
+
+        undo = (move, piece.has_moved, captured, rook_has_moved, self.turn,
+                self.castling, self.en_passant, self.halfmove_clock,
+                self.fullmove_counter, self.key)
+
+        self.key_history.append(self.key)
+
+        # take the old castling rights and en passant file out of the key
+        self.key ^= castling_key(self.castling) ^ en_passant_key(self.en_passant)
+
+        # moving a king or rook from, or capturing on, a starting square
+        # loses the castling rights that depend on it
+        if self.castling != '-':
+            lost = CASTLING_LOST.get(from_sq, '') + CASTLING_LOST.get(to_sq, '')
+
+            if lost:
+                self.castling = ''.join(c for c in self.castling if c not in lost) or '-'
+
+        if captured:
+            self.remove_piece(captured.x, captured.y)
+        elif piece.type_code == PAWN:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+
+        self.set_piece(to_x, to_y, piece)
+        piece.has_moved = True
+
+        if flag == CASTLE:
+            rook = board[to_y][7 if to_x == 6 else 0]
+            self.set_piece(5 if to_x == 6 else 3, to_y, rook)
+            rook.has_moved = True
+        elif flag >= PROMOTION:
+            self._toggle(piece, to_x, to_y)
+            piece.type_code = KNIGHT + flag - PROMOTION
+            self._toggle(piece, to_x, to_y)
+
+        # a double push leaves the square it skipped en passant
+        if flag == DOUBLE_PUSH:
+            self.en_passant = SQUARE_NAMES[(from_sq + to_sq) >> 1]
+        else:
+            self.en_passant = '-'
+
+        if self.turn == 'b':
+            self.turn = 'w'
+            self.fullmove_counter += 1
+        else:
+            self.turn = 'b'
+
+        # put the new castling rights and en passant file in and flip sides
+        self.key ^= (castling_key(self.castling)
+                     ^ en_passant_key(self.en_passant) ^ SIDE_KEY)
+
+        return undo
+
+    def unmake_move(self, undo):
+        """Takes back a move played by make_move.
+
+        Args:
+            undo: The tuple returned by make_move. Moves must be taken back in
+                the reverse order they were played.
+        """
+
+        (move, has_moved, captured, rook_has_moved, self.turn, self.castling,
+         self.en_passant, self.halfmove_clock, self.fullmove_counter,
+         key) = undo
+
+        from_sq, to_sq, flag = move & 63, move >> 6 & 63, move >> 12
+        to_x, to_y = to_sq & 7, to_sq >> 3
+        piece = self._board[to_y][to_x]
+
+        # demote a promoted pawn before moving it back
+        if flag >= PROMOTION:
+            self._toggle(piece, to_x, to_y)
+            piece.type_code = PAWN
+            self._toggle(piece, to_x, to_y)
+
+        self.set_piece(from_sq & 7, from_sq >> 3, piece)
+        piece.has_moved = has_moved
+
+        if flag == CASTLE:
+            rook = self._board[to_y][5 if to_x == 6 else 3]
+            self.set_piece(7 if to_x == 6 else 0, to_y, rook)
+            rook.has_moved = rook_has_moved
+
+        # put back the captured piece, which still holds its old location
+        if captured:
+            self._board[captured.y][captured.x] = captured
+            self._toggle(captured, captured.x, captured.y)
+            self.pieces[captured.color][captured.id] = captured
+
+        # the toggles above only restore the piece terms of the key
+        self.key = key
+        self.key_history.pop()
+
+    def make_null_move(self):
+        """Passes the turn without moving, for null move pruning.
+
+        Returns:
+            tuple: The state needed by unmake_null_move to take it back.
+        """
+
+        undo = (self.en_passant, self.halfmove_clock, self.key)
+
+        self.key_history.append(self.key)
+        self.key ^= en_passant_key(self.en_passant) ^ SIDE_KEY
+        self.en_passant = '-'
+        self.turn = 'b' if self.turn == 'w' else 'w'
+
+        # no position before a pass counts as a repetition of one after it
+        self.halfmove_clock = 0
+
+        return undo
+
+    def unmake_null_move(self, undo):
+        """Takes back a pass played by make_null_move.
+
+        Args:
+            undo: The tuple returned by make_null_move.
+        """
+
+        self.en_passant, self.halfmove_clock, self.key = undo
+        self.turn = 'b' if self.turn == 'w' else 'w'
+        self.key_history.pop()
+
+    def is_repetition(self, times=1):
+        """Checks if this position has occurred before.
+
+        Only positions since the last capture or pawn move are scanned, as
+        none before it can recur, and only every other one, as the same side
+        must be to move.
+
+        Args:
+            times: How many earlier occurrences to look for; 1 for the search,
+                which treats any repetition as a draw, or 2 for threefold
+                repetition.
+
+        Returns:
+            bool: True if the position occurred at least times times before.
+        """
+
+        history = self.key_history
+        end = len(history)
+        found = 0
+
+        for i in range(end - 2, max(end - self.halfmove_clock, 0) - 1, -2):
+            if history[i] == self.key:
+                found += 1
+
+                if found >= times:
+                    return True
+
+        return False
+
+    def repetition_keys(self):
+        """Gets the keys of earlier positions that this one could repeat.
+
+        Returns:
+            list: The keys pushed since the last capture or pawn move, which
+                is all a board built from this one's FEN needs in its
+                key_history to detect the same repetitions.
+        """
+
+        return self.key_history[max(len(self.key_history) - self.halfmove_clock, 0):]
+
+    def position(self):
+        """Gets everything needed to rebuild this board elsewhere, e.g. in
+        another process.
+
+        Returns:
+            tuple: The FEN, the keys from repetition_keys and the draw limit,
+                to pass to from_position.
+        """
+
+        return self.board2fen(), self.repetition_keys(), self.draw_limit
+
+    @staticmethod
+    def from_position(position):
+        """Builds a board from the state returned by position.
+
+        Args:
+            position: A tuple returned by position.
+
+        Returns:
+            Board: A board that plays and detects draws like the original.
+        """
+
+        fen, key_history, draw_limit = position
+
+        board = Board(fen)
+        board.key_history = list(key_history)
+        board.draw_limit = draw_limit
+
+        return board
+
+    def copy(self):
+        """Copies the board, for searching on another thread.
+
+        Returns:
+            Board: A board that plays and detects draws like this one.
+        """
+
+        return Board.from_position(self.position())
+
+    def is_draw(self, times=1):
+        """Checks if the position is drawn by repetition or the move clock.
+
+        Args:
+            times: How many earlier occurrences make a repetition, as for
+                is_repetition.
+
+        Returns:
+            bool: True if the position is drawn, False otherwise.
+        """
+
+        return self.halfmove_clock >= self.draw_limit or self.is_repetition(times)
+
+    def is_square_attacked(self, x, y, by_color):
+        """Checks if a square is attacked.
+
+        Args:
+            x: The x coordinate.
+            y: The y coordinate.
+            by_color: The attacking color (White or Black).
+
+        Returns:
+            bool: True if any piece of by_color attacks x, y.
+        """
+
+        return is_attacked(self, y*8 + x, COLOR_CODES[by_color])
+
+    def get_legal_moves(self):
+        """Generates every legal move for the side to move.
+
+        Returns:
+            list: A Move for every move that doesn't leave the mover's king
+                in check.
+        """
+
+        return self.build_moves(generate_legal_moves(self, int(self.turn == 'b')))
+
+    def find_move(self, from_file, from_rank, to_file, to_rank, promotion=""):
+        """Finds the legal packed move matching a move given by file and rank.
+
+        Args:
+            from_file: The file moved from.
+            from_rank: The rank moved from.
+            to_file: The file moved to.
+            to_rank: The rank moved to.
+            promotion: The promotion type, or an empty string.
+
+        Returns:
+            (int|None): The packed move, with its castling, en passant and
+                promotion flags set, or None if no legal move matches.
+        """
+
+        wanted = (from_file, int(from_rank), to_file, int(to_rank), promotion or "")
+
+        for move in generate_legal_moves(self, int(self.turn == 'b')):
+            if decode_move(move) == wanted:
+                return move
+
+        return None
+
+    def build_moves(self, generated):
+        """Builds Move objects from packed moves.
+
+        Args:
+            generated: Packed moves from one of the bitboard move generators.
+
+        Returns:
+            list: A Move for every packed move.
+        """
+
+        moves = []
+
+        for move in generated:
+            from_sq, to_sq, flag = move & 63, move >> 6 & 63, move >> 12
+            x, y = to_sq & 7, to_sq >> 3
+            promotion = en_passant = ""
+            castling = ()
+
+            if flag >= PROMOTION:
+                promotion = PROMOTION_TYPES[flag - PROMOTION]
+            elif flag == DOUBLE_PUSH:
+                en_passant = SQUARE_NAMES[(from_sq + to_sq) >> 1]
+            elif flag == CASTLE:
+                castling = (7, 5) if x == 6 else (0, 3)
+
+            moves.append(Move(self._board[from_sq >> 3][from_sq & 7], x, y,
+                              promotion, en_passant, castling))
+
+        return moves
+
+    def compute_key(self):
+        """Computes the zobrist key of this position from scratch.
+
+        Used to verify the incrementally updated key in self.key.
+
+        Returns:
+            int: The 64-bit zobrist key.
+        """
+
+        key = castling_key(self.castling) ^ en_passant_key(self.en_passant)
+
+        if self.turn == 'b':
+            key ^= SIDE_KEY
+
+        for color in range(2):
+            for type in range(6):
+                for sq in squares(self.bitboards[color][type]):
+                    key ^= PIECE_KEYS[color][type][sq]
+
+        return key
+
+    def _toggle(self, piece, x, y):
+        """Flips a piece's bit at x, y in its bitboard and color occupancy,
+        and updates the zobrist keys and evaluation sums to match.
+
+        Args:
+            piece: The piece being placed on or lifted from x, y.
+            x: The x coordinate.
+            y: The y coordinate.
+        """
+
+        sq = y*8 + x
+        bit = 1 << sq
+        color = piece.color_code
+        type = piece.type_code
+        bitboards = self.bitboards[color]
+
+        bitboards[type] ^= bit
+        self.occupancy[color] ^= bit
+        self.key ^= PIECE_KEYS[color][type][sq]
+
+        if type == PAWN:
+            self.pawn_key ^= PIECE_KEYS[color][PAWN][sq]
+
+        # the bit is set again if the piece was placed rather than lifted
+        if bitboards[type] & bit:
+            self.mg_score += MG_TABLES[color][type][sq]
+            self.eg_score += EG_TABLES[color][type][sq]
+            self.phase += PHASE_WEIGHTS[type]
+        else:
+            self.mg_score -= MG_TABLES[color][type][sq]
+            self.eg_score -= EG_TABLES[color][type][sq]
+            self.phase -= PHASE_WEIGHTS[type]
+
     def print(self):
         """Prints a board to the screen."""
 
@@ -148,22 +571,17 @@ class Board:
                 if piece == '-':
                     rank.append(None)
                 else:
-                    if piece.isupper():
-                        color = "White"
-                        enemy_color = "Black"
-                    else:
-                        color = "Black"
-                        enemy_color = "White"
+                    color = WHITE if piece.isupper() else BLACK
 
                     if piece != default_split[y][x]:
                         has_moved = True
 
                     piece = Piece(self, id, x, y,
-                        Board.FEN_PIECE_MAP[piece.lower()],
-                        color, enemy_color, has_moved)
+                        TYPE_CODES[Board.FEN_PIECE_MAP[piece.lower()]],
+                        color, has_moved)
 
                     rank.append(piece)
-                    pieces[color][id] = piece
+                    pieces[COLORS[color]][id] = piece
                     id += 1
 
             board.append(rank)
@@ -250,12 +668,22 @@ class Board:
 
 
 class Piece:
-    """Represents a chess piece instance."""
+    """Represents a chess piece instance.
+
+    Pieces are slotted and store their type and color as the small integer
+    codes used by the bitboards. The type, color and enemy color names are
+    looked up from shared tables when read.
+    """
+
+    __slots__ = ("board", "id", "x", "y", "type_code", "color_code", "has_moved")
 
     # options for pawn promotion
-    PROMOTION_OPTIONS = ("Knight", "Bishop", "Rook", "Queen")
+    PROMOTION_OPTIONS = PROMOTION_TYPES
+
+    # FEN characters indexed by type code, upper case for white
+    FEN_CHARS = "PNBRQK"
 
-    def __init__(self, board, id, x, y, type, color, enemy_color, has_moved):
+    def __init__(self, board, id, x, y, type_code, color_code, has_moved):
         """Initializes a piece instance.
 
         Args:
@@ -263,9 +691,8 @@ class Piece:
             id: A unique id.
             x: The piece's x coordinate.
             y: The piece's y coordinate.
-            type: The piece's type (pawn, rook, knight, etc.).
-            color: Player color (White or Black).
-            enemy_color: Enemy color (White or Black).
+            type_code: The piece's type code (PAWN, KNIGHT, etc.).
+            color_code: The piece's color code (WHITE or BLACK).
             has_moved: Whether or not the piece has moved from its starting location.
 
         Returns:
@@ -276,18 +703,32 @@ class Piece:
         self.id = id
         self.x = x
         self.y = y
-        self.type = type
-        self.color = color
-        self.enemy_color = enemy_color
+        self.type_code = type_code
+        self.color_code = color_code
         self.has_moved = has_moved
 
+    @property
+    def type(self):
+        """str: The piece's type (Pawn, Rook, Knight, etc.)."""
+
+        return PIECE_TYPES[self.type_code]
+
+    @property
+    def color(self):
+        """str: Player color (White or Black)."""
+
+        return COLORS[self.color_code]
+
+    @property
+    def enemy_color(self):
+        """str: Enemy color (White or Black)."""
+
+        return COLORS[self.color_code ^ 1]
+
     def __str__(self):
-        if self.type == "Knight":
-            code = 'N'
-        else:
-            code = self.type[0]
+        code = Piece.FEN_CHARS[self.type_code]
 
-        return code.lower() if self.color == "Black" else code.upper()
+        return code.lower() if self.color_code == BLACK else code
 
     def __repr__(self):
         return str(self)
@@ -377,13 +818,12 @@ class Piece:
 
         return legal_moves
 
-    # TODO: implement en passant
     def _get_pawn_moves(self):
         legal_moves = []
         board = self.board
         x, y = self.x, self.y
 
-        if self.color == "White":
+        if self.color_code == WHITE:
             # check movement north 1
             move = x, y-1
 
@@ -549,7 +989,6 @@ class Piece:
         # queen moves are just bishop + rook moves
         return self._get_bishop_moves() + self._get_rook_moves()
 
-    # TODO: implement castling
     def _get_king_moves(self):
         legal_moves = []
         
@@ -571,7 +1010,7 @@ class Piece:
 
         # check castling
         if not self.has_moved:
-            if self.color == "White":
+            if self.color_code == WHITE:
                 # check white kingside castle
                 if 'K' in self.board.castling and self._check_castle(6, 7, 5, 1):
                     legal_moves.append(Move(self, 6, self.y, castling=(7, 5)))
@@ -595,7 +1034,12 @@ class Piece:
             for x in range(self.x+direction, rook.x, direction):
                 if self.board.get_piece(x, self.y):
                     return False
-            
+
+            # the king can't castle out of, through or into check
+            for x in range(self.x, king_end_x+direction, direction):
+                if is_attacked(self.board, self.y*8 + x, self.color_code ^ 1):
+                    return False
+
             return True
         return False
 
@@ -603,85 +1047,32 @@ class Piece:
         # queenside ending rook x == ending king x+1
 
     def in_check(self):
-        # for every enemy piece
-        for p in self.board.pieces[self.enemy_color].values():
-            # if an enemy can move to king location, we're in check
-            if any(self.x == m.x and self.y == m.y for m in p.get_moves()):
-                return True
-
-        return False
+        return is_attacked(self.board, self.y*8 + self.x, self.color_code ^ 1)
 
     def get_moves(self):
-        PIECE_MOVE_MAP = {
-            'Pawn': self._get_pawn_moves,
-            'Knight': self._get_knight_moves,
-            'Bishop': self._get_bishop_moves,
-            'Rook': self._get_rook_moves,
-            'Queen': self._get_queen_moves,
-            'King': self._get_king_moves
-        }
-
-        return PIECE_MOVE_MAP[self.type]()
+        return Piece.MOVE_GENERATORS[self.type_code](self)
 
     def move(self, move):
-        if not self.has_moved:
-            if move.piece.type == "King":
-                # remove white castling permissions
-                if str(move.piece).isupper():
-                    self.board.castling = ''.join([c for c in self.board.castling if c.islower()])
-                # remove black castling permissions
-                else:
-                    self.board.castling = ''.join([c for c in self.board.castling if c.isupper()])
-                
-                # if the move was a castle
-                if move.castling:
-                    rook_start_x, rook_end_x = move.castling
-                    rook = self.board.get_piece(rook_start_x, move.y)
-
-                    # move rook
-                    self.board.set_piece(rook_end_x, move.y, rook)
-                    rook.has_moved = True
-
-            elif move.piece.type == "Rook":
-                if str(move.piece).isupper():
-                    if self.x == 0:
-                        # remove white queenside castling permission
-                        self.board.castling = self.board.castling.replace('Q', '')
-                    else:
-                        # remove white kingside castling permission
-                        self.board.castling = self.board.castling.replace('K', '')
-                else:
-                    if self.x == 0:
-                        # remove black queenside castling permission
-                        self.board.castling = self.board.castling.replace('q', '')
-                    else:
-                        # remove black kingside castling permission
-                        self.board.castling = self.board.castling.replace('k', '')
+        """Plays one of this piece's moves on its board.
 
-        if move.piece.type == "Pawn":
-            if self.board.en_passant == ''.join(Board.coord2fr(move.x, move.y)):
-                x, y = Board.fr2coord(*list(self.board.en_passant))
-                self.board.remove_piece(x, y + (1 if self.color == "White" else -1))
-
-            self.board.halfmove_clock = 0
-        else:
-            self.board.halfmove_clock += 1
-
-        self.board.set_piece(move.x, move.y, self)
-        self.has_moved = True
-
-        if move.promotion:
-            self.type = move.promotion
-
-        self.board.en_passant = move.en_passant or "-"
-        self.board.castling = self.board.castling or '-'
-        self.board.turn = self.enemy_color[0].lower()
+        Args:
+            move: The Move to play.
+        """
 
-        if move.piece.color == "Black":
-            self.board.fullmove_counter += 1
+        self.board.make_move(move.pack())
 
     def is_enemy(self, other):
-        return self.color != other.color
+        return self.color_code != other.color_code
+
+    # move generators indexed by type code
+    MOVE_GENERATORS = (
+        _get_pawn_moves,
+        _get_knight_moves,
+        _get_bishop_moves,
+        _get_rook_moves,
+        _get_queen_moves,
+        _get_king_moves
+    )
 
 
 class Player:
@@ -691,8 +1082,27 @@ class Player:
         self.pieces = board.pieces[color]
 
     def get_all_moves(self):
-        #return [m for m in p.get_moves() for p in self.pieces.values()]
-        return [m for p in self.pieces.values() for m in p.get_moves()]
+        """Generates every pseudo-legal move for this player.
+
+        Moves are generated from the board's bitboards and produce the same
+        moves as calling Piece.get_moves on every piece, in a different order.
+
+        Returns:
+            list: A Move for every pseudo-legal move.
+        """
+
+        return self.board.build_moves(
+            generate_moves(self.board, COLOR_CODES[self.color]))
+
+    def get_legal_moves(self):
+        """Generates every legal move for this player.
+
+        Returns:
+            list: A Move for every move that doesn't leave our king in check.
+        """
+
+        return self.board.build_moves(
+            generate_legal_moves(self.board, COLOR_CODES[self.color]))
 
 
 class Move:
@@ -716,6 +1126,29 @@ class Move:
     def __repr__(self):
         return str(self)
 
+    def pack(self):
+        """Packs this move into 16 bits.
+
+        Returns:
+            int: The move packed as from | to << 6 | flag << 12, as produced
+                by the bitboard move generators.
+        """
+
+        piece = self.piece
+        flag = 0
+
+        if self.promotion:
+            flag = PROMOTION + PROMOTION_TYPES.index(self.promotion)
+        elif self.castling:
+            flag = CASTLE
+        elif self.en_passant:
+            flag = DOUBLE_PUSH
+        elif (piece.type_code == PAWN and self.x != piece.x
+                and piece.board.en_passant == SQUARE_NAMES[self.y*8 + self.x]):
+            flag = EN_PASSANT
+
+        return encode_move(piece.y*8 + piece.x, self.y*8 + self.x, flag)
+
 #board = Board("rnbqkbnr/pppppppp/8/7P/8/8/PPPPPPP1/RNBQKBNR w KQkq - 0 1")
 ##board = Board("rnbqkbnr/pppppp1p/8/6p1/7P/8/PPPPPPP1/RNBQKBNR w KQkq - 0 1")
 #board.print()
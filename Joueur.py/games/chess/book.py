@@ -0,0 +1,421 @@
+"""Opening book: moves to play straight away in known positions.
+
+A book file is a flat array of fixed-size records, each a position's
+zobrist key, a packed move and the move's weight, sorted by key. The file
+is memory-mapped and binary-searched in place, so opening a book costs
+nothing however large it is and a lookup only touches O(log n) records.
+
+Books are compiled from local PGN games or EPD positions. Run from the
+client's root directory:
+
+    python -m games.chess.book games.pgn                  # writes book.bin
+    python -m games.chess.book games.pgn --max-ply 16 --out openings.bin
+    python -m games.chess.book positions.epd --epd        # bm moves only
+    python -m games.chess.book --probe "<FEN>"            # list book moves
+"""
+
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+from random import Random
+
+from games.chess.bitboard import (CASTLE, PROMOTION, PROMOTION_TYPES, SQUARE_NAMES,
+                                   TYPE_CODES, decode_move, generate_legal_moves)
+from games.chess.board import Board
+
+# big-endian key, move and weight, so records sort the same as their keys
+RECORD = struct.Struct(">QHH")
+
+# the book the AI opens unless told otherwise by its book AI setting
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+
+# how many plies of each game are put in the book
+MAX_PLY = 24
+
+MAX_WEIGHT = 0xFFFF
+
+_SAN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$")
+
+# PGN comments, variations and numeric annotation glyphs, which are skipped
+_PGN_NOISE = re.compile(r"\{[^}]*\}|;[^\n]*|\$\d+")
+_MOVE_NUMBER = re.compile(r"^\d+\.+")
+_RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+_PIECE_LETTERS = {"N": "Knight", "B": "Bishop", "R": "Rook", "Q": "Queen", "K": "King"}
+
+
+class OpeningBook:
+    """A memory-mapped book file, looked up by binary search."""
+
+    def __init__(self, path=DEFAULT_PATH, seed=None):
+        """Maps a book file into memory.
+
+        Args:
+            path: The book file, as written by write_book.
+            seed: Seeds the choice between weighted moves, for repeatable
+                games.
+
+        Returns:
+            An open book.
+
+        Raises:
+            OSError: If the file can't be opened.
+            ValueError: If the file isn't a whole number of records.
+        """
+
+        self.path = path
+        self._random = Random(seed)
+
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+
+            if size % RECORD.size:
+                raise ValueError("{} is not a book file".format(path))
+
+            # an empty file can't be mapped, but is a valid empty book
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        self.size = size // RECORD.size
+
+    def __len__(self):
+        return self.size
+
+    def entries(self, key):
+        """Looks up every book move for a position.
+
+        Args:
+            key: The position's zobrist key.
+
+        Returns:
+            list: A (packed move, weight) tuple for each book move.
+        """
+
+        unpack_from, record_size = RECORD.unpack_from, RECORD.size
+
+        # find the first record whose key isn't below the one wanted
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) >> 1
+
+            if unpack_from(self._map, middle * record_size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        for index in range(low, self.size):
+            record_key, move, weight = unpack_from(self._map, index * record_size)
+
+            if record_key != key:
+                break
+
+            entries.append((move, weight))
+
+        return entries
+
+    def choose(self, board):
+        """Picks a book move for a board, at random in proportion to weight.
+
+        Args:
+            board: The board to pick a move for.
+
+        Returns:
+            (int|None): A legal packed move, or None if the position isn't in
+                the book.
+        """
+
+        # a key collision could give moves from another position, so only
+        # moves legal here are considered
+        legal = generate_legal_moves(board, int(board.turn == 'b'))
+        entries = [(move, weight) for move, weight in self.entries(board.key)
+                   if weight and move in legal]
+
+        if not entries:
+            return None
+
+        pick = self._random.randrange(sum(weight for _, weight in entries))
+
+        for move, weight in entries:
+            pick -= weight
+
+            if pick < 0:
+                return move
+
+    def close(self):
+        """Unmaps the book file."""
+
+        if self.size:
+            self._map.close()
+
+
+def parse_san(board, san):
+    """Finds the legal packed move matching a move in standard algebraic
+    notation.
+
+    Args:
+        board: The board the move is played on.
+        san: The move, e.g. "Nf3", "exd5", "e8=Q+" or "O-O".
+
+    Returns:
+        (int|None): The packed move, or None if no legal move matches.
+    """
+
+    san = san.rstrip("+#!?")
+    color = int(board.turn == 'b')
+    legal = generate_legal_moves(board, color)
+
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        to_file = "g" if len(san) == 3 else "c"
+
+        for move in legal:
+            if move >> 12 == CASTLE and decode_move(move)[2] == to_file:
+                return move
+
+        return None
+
+    match = _SAN.match(san)
+    if not match:
+        return None
+
+    piece, from_file, from_rank, to, promotion = match.groups()
+    pieces = board.bitboards[color][TYPE_CODES[_PIECE_LETTERS.get(piece, "Pawn")]]
+    to_sq = SQUARE_NAMES.index(to)
+    flag = PROMOTION + PROMOTION_TYPES.index(_PIECE_LETTERS[promotion]) if promotion else None
+
+    found = None
+    for move in legal:
+        from_sq = move & 63
+
+        if (move >> 6 & 63 != to_sq or not pieces >> from_sq & 1
+                or from_file and SQUARE_NAMES[from_sq][0] != from_file
+                or from_rank and SQUARE_NAMES[from_sq][1] != from_rank):
+            continue
+
+        if flag is None and move >> 12 >= PROMOTION or flag is not None and move >> 12 != flag:
+            continue
+
+        # an ambiguous move can't be trusted to be the one meant
+        if found is not None:
+            return None
+
+        found = move
+
+    return found
+
+
+def read_pgn(text):
+    """Splits PGN text into games.
+
+    Args:
+        text: The contents of a PGN file.
+
+    Yields:
+        (str, list): Each game's starting FEN and its moves in standard
+            algebraic notation, main line only.
+    """
+
+    fen = Board.DEFAULT_FEN
+    movetext = []
+    in_movetext = False
+
+    for line in text.splitlines() + ["[Event \"\"]"]:
+        line = line.strip()
+
+        if line.startswith("["):
+            # tags start the next game
+            if in_movetext:
+                yield fen, _pgn_moves("\n".join(movetext))
+                fen, movetext, in_movetext = Board.DEFAULT_FEN, [], False
+
+            if line.startswith("[FEN "):
+                fen = line[5:].strip(" ]").strip('"')
+        elif line and not line.startswith("%"):
+            movetext.append(line)
+            in_movetext = True
+
+
+def _pgn_moves(movetext):
+    movetext = _PGN_NOISE.sub(" ", movetext)
+
+    # drop variations, which may be nested
+    depth = 0
+    main_line = []
+    for char in movetext:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+        elif not depth:
+            main_line.append(char)
+
+    moves = []
+    for token in "".join(main_line).split():
+        token = _MOVE_NUMBER.sub("", token)
+
+        if token and token not in _RESULTS:
+            moves.append(token)
+
+    return moves
+
+
+def read_epd(text):
+    """Reads the best moves of EPD positions.
+
+    Args:
+        text: The contents of an EPD file.
+
+    Yields:
+        (str, list): Each position's FEN and its bm moves in standard
+            algebraic notation, which are alternatives rather than a game,
+            for collect_epd.
+    """
+
+    for line in text.splitlines():
+        fields = line.split(None, 4)
+
+        if len(fields) < 4:
+            continue
+
+        moves = []
+        for operation in (fields[4] if len(fields) > 4 else "").split(";"):
+            operation = operation.split()
+
+            if operation and operation[0] == "bm":
+                moves.extend(operation[1:])
+
+        yield " ".join(fields[:4]) + " 0 1", moves
+
+
+def collect(games, max_ply=MAX_PLY):
+    """Counts how often each move is played from each position.
+
+    Args:
+        games: (FEN, moves) pairs from read_pgn.
+        max_ply: How many moves of each game to count.
+
+    Returns:
+        dict: The number of times each move was played, keyed by (zobrist
+            key, packed move).
+    """
+
+    counts = {}
+
+    for fen, moves in games:
+        board = Board(fen)
+
+        for san in moves[:max_ply]:
+            move = parse_san(board, san)
+
+            if move is None:
+                print("Skipping the rest of a game at illegal move {} in {}".format(
+                    san, board.board2fen()), file=sys.stderr)
+                break
+
+            entry = (board.key, move)
+            counts[entry] = counts.get(entry, 0) + 1
+            board.make_move(move)
+
+    return counts
+
+
+def collect_epd(positions):
+    """Counts the best moves of EPD positions.
+
+    Each bm move is counted under its own position without being played, as
+    they are alternatives to one another.
+
+    >>> counts = collect_epd(read_epd(Board.DEFAULT_FEN.rsplit(" ", 2)[0] + " bm e4 d4 Nf3;"))
+    >>> len(counts), len({key for key, _ in counts})
+    (3, 1)
+
+    Args:
+        positions: (FEN, moves) pairs from read_epd.
+
+    Returns:
+        dict: The number of times each move was given, keyed by (zobrist
+            key, packed move).
+    """
+
+    counts = {}
+
+    for fen, moves in positions:
+        board = Board(fen)
+
+        for san in moves:
+            move = parse_san(board, san)
+
+            if move is None:
+                print("Skipping illegal move {} in {}".format(san, fen), file=sys.stderr)
+                continue
+
+            entry = (board.key, move)
+            counts[entry] = counts.get(entry, 0) + 1
+
+    return counts
+
+
+def write_book(counts, path):
+    """Writes move counts to a book file, sorted by key.
+
+    Args:
+        counts: Move weights keyed by (zobrist key, packed move), as returned
+            by collect.
+        path: The file to write.
+
+    Returns:
+        int: The number of records written.
+    """
+
+    with open(path, 'wb') as file:
+        for (key, move), weight in sorted(counts.items()):
+            file.write(RECORD.pack(key, move, min(weight, MAX_WEIGHT)))
+
+    return len(counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compiles an opening book from PGN games or EPD positions.")
+    parser.add_argument('source', nargs='?', help='the PGN or EPD file to read')
+    parser.add_argument('--epd', action='store_true',
+                        help='read EPD positions and their bm moves instead of PGN games')
+    parser.add_argument('--max-ply', type=int, default=MAX_PLY,
+                        help='how many plies of each game to put in the book')
+    parser.add_argument('--out', default=DEFAULT_PATH, help='the book file to write')
+    parser.add_argument('--probe', metavar='FEN', help='list the book moves of a position')
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        board = Board(args.probe)
+        book = OpeningBook(args.out)
+
+        for move, weight in book.entries(board.key):
+            flag = move >> 12
+            print("{}{}{} {}".format(SQUARE_NAMES[move & 63], SQUARE_NAMES[move >> 6 & 63],
+                                     "nbrq"[flag - PROMOTION] if flag >= PROMOTION else "",
+                                     weight))
+
+        book.close()
+        return 0
+
+    if not args.source:
+        parser.error("a PGN or EPD file is needed to build a book")
+
+    with open(args.source) as file:
+        text = file.read()
+
+    if args.epd or args.source.endswith(".epd"):
+        counts = collect_epd(read_epd(text))
+    else:
+        counts = collect(read_pgn(text), args.max_ply)
+
+    records = write_book(counts, args.out)
+    print("Wrote {} book moves to {}".format(records, args.out))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""Pawn structure evaluation and the pawn hash table caching it.
+
+Doubled, isolated, backward and passed pawns depend only on where the
+pawns stand, which changes far less often than the rest of the position.
+Their scores, and the passed pawns found, are cached in a small table
+indexed by the board's pawn key, a zobrist key of the pawns alone, so most
+evaluations skip the pawn scan entirely.
+"""
+
+from games.chess.bitboard import BLACK, FILE_A, PAWN, PAWN_ATTACKS, WHITE, squares
+
+# (middlegame, endgame) penalties for each weak pawn, in centipawns
+DOUBLED = (-10, -25)
+ISOLATED = (-5, -15)
+BACKWARD = (-8, -12)
+
+# passed pawn bonuses indexed by rank counted from the pawn's own side, so
+# a pawn about to promote is on rank 6
+PASSED_MG = (0, 0, 5, 10, 20, 35, 55, 0)
+PASSED_EG = (0, 5, 10, 20, 35, 60, 90, 0)
+
+# an extra endgame bonus for a passed pawn with nothing in its way
+FREE_PASSED_EG = (0, 0, 2, 5, 10, 20, 35, 0)
+
+FILES = tuple(FILE_A << x for x in range(8))
+
+# the files either side of each file
+ADJACENT_FILES = tuple((FILES[x-1] if x > 0 else 0) | (FILES[x+1] if x < 7 else 0)
+                       for x in range(8))
+
+
+def _build_span_table(color, files):
+    # the squares on the given files ahead of each square, as seen by color;
+    # white pawns move towards lower indices
+    table = []
+
+    for sq in range(64):
+        y = sq >> 3
+        ranks = 0
+
+        for rank in (range(y) if color == WHITE else range(y + 1, 8)):
+            ranks |= 0xFF << (rank*8)
+
+        table.append(ranks & files[sq & 7])
+
+    return tuple(table)
+
+
+# squares ahead of a pawn on its own file, indexed by color code and square
+FRONT_SPAN = tuple(_build_span_table(color, FILES) for color in range(2))
+
+# squares ahead of a pawn on its own and the adjacent files; a pawn with no
+# enemy pawns there is passed
+PASSED_SPAN = tuple(
+    _build_span_table(color, tuple(FILES[x] | ADJACENT_FILES[x] for x in range(8)))
+    for color in range(2))
+
+# squares beside and behind a pawn on the adjacent files, where pawns able
+# to support its advance stand
+SUPPORT_SPAN = tuple(
+    tuple(ADJACENT_FILES[sq & 7] & ~PASSED_SPAN[color][sq] for sq in range(64))
+    for color in range(2))
+
+
+def pawn_structure(white_pawns, black_pawns):
+    """Scores the pawn structure of a position.
+
+    Args:
+        white_pawns: A bitboard of the white pawns.
+        black_pawns: A bitboard of the black pawns.
+
+    Returns:
+        (int, int, int, int): The white-relative middlegame and endgame
+            scores, and bitboards of the white and black passed pawns.
+    """
+
+    mg = eg = 0
+    passed = [0, 0]
+    pawns = (white_pawns, black_pawns)
+
+    for color in (WHITE, BLACK):
+        own, enemy = pawns[color], pawns[color ^ 1]
+        sign = 1 if color == WHITE else -1
+        front_span, passed_span, support_span = (FRONT_SPAN[color], PASSED_SPAN[color],
+                                                 SUPPORT_SPAN[color])
+        attacks = PAWN_ATTACKS[color]
+        forward = -8 if color == WHITE else 8
+
+        for sq in squares(own):
+            # the rank from the pawn's own side, 1 on its starting rank
+            rank = 7 - (sq >> 3) if color == WHITE else sq >> 3
+
+            if own & front_span[sq]:
+                # only the pawns behind are doubled, the front one may be passed
+                mg += sign * DOUBLED[0]
+                eg += sign * DOUBLED[1]
+            elif not enemy & passed_span[sq]:
+                passed[color] |= 1 << sq
+                mg += sign * PASSED_MG[rank]
+                eg += sign * PASSED_EG[rank]
+
+            if not own & ADJACENT_FILES[sq & 7]:
+                mg += sign * ISOLATED[0]
+                eg += sign * ISOLATED[1]
+            elif not own & support_span[sq] and attacks[sq + forward] & enemy:
+                # no pawn can come up to support it, and it can't advance
+                # without being taken
+                mg += sign * BACKWARD[0]
+                eg += sign * BACKWARD[1]
+
+    return mg, eg, passed[WHITE], passed[BLACK]
+
+
+def free_passed_score(white_passed, black_passed, occupied):
+    """Scores the passed pawns with nothing standing in their way.
+
+    Args:
+        white_passed: A bitboard of the white passed pawns.
+        black_passed: A bitboard of the black passed pawns.
+        occupied: A bitboard of every piece on the board.
+
+    Returns:
+        int: The white-relative endgame bonus.
+    """
+
+    score = 0
+
+    for sq in squares(white_passed):
+        if not FRONT_SPAN[WHITE][sq] & occupied:
+            score += FREE_PASSED_EG[7 - (sq >> 3)]
+
+    for sq in squares(black_passed):
+        if not FRONT_SPAN[BLACK][sq] & occupied:
+            score -= FREE_PASSED_EG[sq >> 3]
+
+    return score
+
+
+class PawnTable:
+    """A fixed-size, always replace cache of pawn structure scores."""
+
+    def __init__(self, entries=1 << 14):
+        """Initializes an empty pawn hash table.
+
+        Args:
+            entries: The number of entries, rounded down to a power of two.
+
+        Returns:
+            An empty pawn hash table.
+        """
+
+        size = 1 << (max(entries, 1).bit_length() - 1)
+        self._mask = size - 1
+        self._keys = [None] * size
+        self._entries = [None] * size
+
+        # lookups and hits over the table's lifetime
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, board):
+        """Gets a board's pawn structure, scanning the pawns only on a miss.
+
+        Args:
+            board: The board, whose pawn_key indexes the table.
+
+        Returns:
+            (int, int, int, int): As returned by pawn_structure.
+        """
+
+        key = board.pawn_key
+        index = key & self._mask
+        self.probes += 1
+
+        if self._keys[index] == key:
+            self.hits += 1
+            return self._entries[index]
+
+        entry = pawn_structure(board.bitboards[WHITE][PAWN], board.bitboards[BLACK][PAWN])
+        self._keys[index] = key
+        self._entries[index] = entry
+
+        return entry
+
+    @property
+    def hit_rate(self):
+        """float: The fraction of probes answered from the table."""
+
+        return self.hits / self.probes if self.probes else 0.0
+
+    def clear(self):
+        """Empties the table and resets its statistics."""
+
+        self._keys = [None] * len(self._keys)
+        self._entries = [None] * len(self._entries)
+        self.probes = self.hits = 0
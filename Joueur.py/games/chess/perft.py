@@ -0,0 +1,197 @@
+"""Perft: counts the leaf nodes of the legal move tree to verify and
+benchmark the local board's move generation.
+
+Run from the client's root directory:
+
+    python -m games.chess.perft                  # run the reference suite
+    python -m games.chess.perft --max-depth 3    # a quick check, capping the depth
+    python -m games.chess.perft --fen "<FEN>" --depth 3 --divide
+"""
+
+import argparse
+import sys
+from time import time
+
+from games.chess.bitboard import decode_move, generate_legal_moves
+from games.chess.board import Board
+
+# reference positions as (name, FEN, expected leaf nodes at depths 1, 2, ...),
+# the full suite counting each to its deepest depth
+POSITIONS = (
+    ("start", Board.DEFAULT_FEN, (20, 400, 8902, 197281, 4865609)),
+    ("kiwipete",
+     "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     (48, 2039, 97862, 4085603)),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     (14, 191, 2812, 43238, 674624)),
+    ("position 4",
+     "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     (6, 264, 9467, 422333)),
+    ("position 5",
+     "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     (44, 1486, 62379, 2103487)),
+    ("position 6",
+     "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     (46, 2079, 89890, 3894594)),
+    ("illegal en passant 1", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+     (18, 92, 1670, 10138, 185429, 1134888)),
+    ("illegal en passant 2", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+     (13, 102, 1266, 10276, 135655, 1015133)),
+    ("en passant gives check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+     (15, 126, 1928, 13931, 206379, 1440467)),
+    ("short castle gives check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+     (15, 66, 1198, 6399, 120330, 661072)),
+    ("long castle gives check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1",
+     (16, 71, 1286, 7418, 141077, 803711)),
+    ("castling rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1",
+     (26, 1141, 27826, 1274206)),
+    ("castling prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",
+     (44, 1494, 50509, 1720476)),
+    ("promote out of check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+     (11, 133, 1442, 19174, 266199, 3821001)),
+    ("discovered check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1",
+     (29, 165, 5160, 31961, 1004658)),
+    ("promote to give check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1",
+     (9, 40, 472, 2661, 38983, 217342)),
+    ("underpromote to give check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+     (6, 27, 273, 1329, 18135, 92683)),
+    ("self stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1", (2, 6, 13, 63, 382, 2217)),
+    ("stalemate and checkmate 1", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1",
+     (10, 25, 268, 926, 10857, 43261, 567584)),
+    ("stalemate and checkmate 2", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+     (37, 183, 6559, 23527)),
+)
+
+
+def perft(board, depth):
+    """Counts the leaf nodes of the legal move tree.
+
+    Args:
+        board: The board to count from. It is walked with make_move and
+            unmake_move and left as it was found.
+        depth: The number of plies to count to.
+
+    Returns:
+        int: The number of leaf nodes at depth.
+    """
+
+    moves = generate_legal_moves(board, int(board.turn == 'b'))
+
+    # count the last ply's moves without playing them
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+
+    nodes = 0
+
+    for move in moves:
+        undo = board.make_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move(undo)
+
+    return nodes
+
+
+def divide(board, depth):
+    """Counts the leaf nodes below each legal move, for debugging.
+
+    Args:
+        board: The board to count from.
+        depth: The number of plies to count to, including the root move.
+
+    Returns:
+        dict: Leaf node counts keyed by move, e.g. "e2e4" or "a7a8Queen".
+    """
+
+    counts = {}
+
+    for move in generate_legal_moves(board, int(board.turn == 'b')):
+        name = "{}{}{}{}{}".format(*decode_move(move))
+
+        undo = board.make_move(move)
+        counts[name] = perft(board, depth - 1)
+        board.unmake_move(undo)
+
+    return counts
+
+
+def run_suite(max_depth=None):
+    """Runs perft on every reference position and checks the counts.
+
+    Args:
+        max_depth: If set, positions are counted to at most this depth.
+
+    Returns:
+        bool: True if every count matched, False otherwise.
+
+    Raises:
+        ValueError: If max_depth is below 1, as nothing would be checked.
+    """
+
+    if max_depth is not None and max_depth < 1:
+        raise ValueError("perft needs a depth of at least 1, not {}".format(max_depth))
+
+    passed = True
+    total_nodes = 0
+    total_time = 0.0
+
+    for name, fen, counts in POSITIONS:
+        depth = len(counts) if max_depth is None else min(len(counts), max_depth)
+        expected = counts[depth - 1]
+
+        start = time()
+        nodes = perft(Board(fen), depth)
+        elapsed = time() - start
+
+        total_nodes += nodes
+        total_time += elapsed
+        passed = passed and nodes == expected
+
+        print("{:<28} depth {} {:>9} nodes {:>8.2f}s {:>9.0f} nps {}".format(
+            name, depth, nodes, elapsed, nodes / elapsed if elapsed else 0,
+            "ok" if nodes == expected else "FAILED, expected {}".format(expected)))
+
+    if total_time:
+        print("{} nodes in {:.2f}s, {:.0f} nodes/sec".format(
+            total_nodes, total_time, total_nodes / total_time))
+
+    return passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Counts leaf nodes of the local board's legal move tree.")
+    parser.add_argument('--fen', help='a position to count from instead of the reference suite')
+    parser.add_argument('--depth', type=int, default=4, help='the depth to count to with --fen')
+    parser.add_argument('--divide', action='store_true', help='print the count below each root move')
+    parser.add_argument('--max-depth', type=int, help='count reference positions to at most this depth')
+    args = parser.parse_args(argv)
+
+    if not args.fen:
+        if args.max_depth is not None and args.max_depth < 1:
+            parser.error("--max-depth must be at least 1")
+
+        return 0 if run_suite(args.max_depth) else 1
+
+    board = Board(args.fen)
+    start = time()
+
+    if args.divide:
+        counts = divide(board, args.depth)
+
+        for name in sorted(counts):
+            print("{}: {}".format(name, counts[name]))
+
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(board, args.depth)
+
+    elapsed = time() - start
+
+    print("{} nodes in {:.2f}s, {:.0f} nodes/sec".format(
+        nodes, elapsed, nodes / elapsed if elapsed else 0))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
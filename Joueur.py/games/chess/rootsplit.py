@@ -0,0 +1,236 @@
+from multiprocessing import Event, Process, Queue, Value
+from queue import Empty
+from threading import Thread
+from time import time
+
+from games.chess.bitboard import generate_legal_moves
+from games.chess.board import Board
+from games.chess.pawns import PawnTable
+from games.chess.search import INFINITY, MATE_BOUND, Searcher, expected_reply
+from games.chess.smp import ParallelSearcher, stop_on
+from games.chess.transposition import AGE_MASK, TranspositionTable
+
+# how often, in seconds, the main process checks the clock while waiting for
+# the workers
+POLL_INTERVAL = 0.01
+
+
+class RootSplitter(ParallelSearcher):
+    """Parallel search that splits the root moves between worker processes.
+
+    Each iteration of iterative deepening deals the root moves out to the
+    workers in turn, so which worker searches which moves depends only on
+    their order. A worker searches its moves one after another, each one
+    below the best root score found so far so moves tying it come back
+    with exact scores, and keeps its own transposition and pawn hash
+    tables.
+
+    By default the best score is shared between the workers as it rises,
+    which narrows every worker's window and saves over a third of the
+    nodes. A window then depends on which moves finished first, which can
+    change scores and so the move chosen. Without the shared bound each
+    worker only uses its own best score, and unless the time limit cuts an
+    iteration short the search is fully reproducible, for benchmarks.
+    """
+
+    def __init__(self, threads, size_mb=16, options=None, shared_bound=True):
+        """Starts the worker processes.
+
+        Args:
+            threads: The number of worker processes.
+            size_mb: The size of each worker's transposition table.
+            options: Keyword arguments passed on to every Searcher.
+            shared_bound: If False, workers don't share the best root
+                score, so results don't depend on scheduling.
+
+        Returns:
+            A parallel searcher with idle workers.
+        """
+
+        ParallelSearcher.__init__(self, threads, options)
+
+        self._age = 0
+
+        # the best root score found so far this iteration, which only rises,
+        # or None to keep the workers apart
+        self._alpha = Value('i', -INFINITY) if shared_bound else None
+
+        # set to stop the workers' searches, when time runs out or the
+        # search is stopped, and at the end of every search
+        self._stop = Event()
+        self._results = Queue()
+        self._jobs = []
+        self._workers = []
+
+        for index in range(threads):
+            jobs = Queue()
+            worker = Process(target=_worker, args=(index, size_mb, self.options, jobs,
+                                                   self._results, self._alpha, self._stop))
+            worker.daemon = True
+            worker.start()
+
+            self._jobs.append(jobs)
+            self._workers.append(worker)
+
+    def search(self, board, time_limit, soft_limit=None, max_depth=64):
+        """Searches the board by iterative deepening, splitting the root moves.
+
+        Args:
+            board: The board to search.
+            time_limit: The number of seconds the search may run for. If
+                None, the limits already set by set_time_limit are kept.
+            soft_limit: If set, no new iteration is started after this many
+                seconds.
+            max_depth: The deepest iteration to search to.
+
+        Returns:
+            (int|None): The best packed move found by the last iteration to
+                finish, or None if the side to move has no legal moves.
+        """
+
+        start = time()
+        if time_limit is not None:
+            self.set_time_limit(time_limit, soft_limit)
+
+        self._stop.clear()
+        self.nodes = 0
+        self.depth = 0
+        self._age += 1
+
+        # positions are shipped as FEN, with the earlier positions' keys so
+        # repetitions are still seen
+        position = board.position()
+        moves = list(generate_legal_moves(board, int(board.turn == 'b')))
+        self.best_move = moves[0] if moves else None
+        self.ponder_move = None
+        worker_nodes = [0] * self.threads
+
+        for depth in range(1, max_depth + 1):
+            if not moves or self._stopped or time() >= self._stop_time:
+                break
+
+            # the i-th move goes to worker i % threads
+            if self._alpha is not None:
+                self._alpha.value = -INFINITY
+
+            for index, jobs in enumerate(self._jobs):
+                jobs.put((position, moves[index::self.threads], depth, self._age))
+
+            scores = [None] * len(moves)
+            replies = [None] * len(moves)
+            stopped = False
+
+            for _ in self._jobs:
+                index, worker_scores, worker_replies, nodes, worker_stopped = self._result()
+                worker_nodes[index] += nodes
+                self.nodes += nodes
+
+                # a stopped worker only scores the moves it finished
+                if worker_stopped:
+                    stopped = True
+                else:
+                    scores[index::self.threads] = worker_scores
+                    replies[index::self.threads] = worker_replies
+
+            # an unfinished iteration can't be trusted, keep the last result
+            if stopped:
+                break
+
+            # max picks the earliest of equal scores, so ties break the same
+            # way every run
+            best = max(range(len(moves)), key=lambda i: scores[i])
+            self.best_move, self.score, self.depth = moves[best], scores[best], depth
+            self.ponder_move = replies[best]
+
+            # search the best move first in the next iteration, leaving the
+            # rest in a fixed order
+            moves.insert(0, moves.pop(best))
+
+            if abs(self.score) > MATE_BOUND or len(moves) == 1:
+                break
+
+            if time() >= self._soft_time:
+                break
+
+        # lets the workers' stop threads finish
+        self._stop.set()
+
+        self.worker_nodes = worker_nodes
+        self.elapsed = time() - start
+        self._stopped = False
+
+        return self.best_move
+
+    def _result(self):
+        # waits for a worker's result, stopping the workers once time is up
+        while True:
+            try:
+                return self._results.get(timeout=POLL_INTERVAL)
+            except Empty:
+                if time() >= self._stop_time:
+                    self._stop.set()
+
+    def _limits_changed(self):
+        if self._stopped:
+            self._stop.set()
+
+    def close(self):
+        """Stops the worker processes."""
+
+        for jobs in self._jobs:
+            jobs.put(None)
+
+        for worker in self._workers:
+            worker.join()
+
+        self._workers = []
+        self._jobs = []
+
+
+def _worker(index, size_mb, options, jobs, results, shared_alpha, stop):
+    tt = TranspositionTable(size_mb)
+    pawns = PawnTable()
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+
+        position, moves, depth, age = job
+        board = Board.from_position(position)
+
+        tt.age = age & AGE_MASK
+        searcher = Searcher(board, tt, pawns=pawns, **options)
+        searcher.set_time_limit(float("inf"))
+
+        # the main process keeps the time, and stops the search through the
+        # event
+        Thread(target=stop_on, args=(stop, searcher), daemon=True).start()
+
+        scores = []
+        replies = []
+        alpha = -INFINITY
+
+        for move in moves:
+            # search one below the best so far, so a move tying it still gets
+            # an exact score
+            if shared_alpha is not None:
+                alpha = max(alpha, shared_alpha.value)
+
+            score = searcher.search_move(move, depth, alpha - 1, INFINITY)
+
+            if searcher.stopped:
+                break
+
+            scores.append(score)
+
+            if score > alpha:
+                alpha = score
+
+                if shared_alpha is not None:
+                    with shared_alpha.get_lock():
+                        shared_alpha.value = max(shared_alpha.value, score)
+
+            replies.append(expected_reply(board, tt, move))
+
+        results.put((index, scores, replies, searcher.nodes, searcher.stopped))
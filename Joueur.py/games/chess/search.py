@@ -0,0 +1,742 @@
+from time import time
+
+from games.chess.bitbase import DRAW, MAX_PHASE as MAX_BITBASE_PHASE, probe
+from games.chess.bitboard import (BISHOP, EN_PASSANT, KING, KNIGHT, PAWN,
+                                   PROMOTION, QUEEN, ROOK, generate_legal_moves,
+                                   is_attacked, see)
+from games.chess.evaluation import MG_VALUES, evaluate
+from games.chess.pawns import PawnTable
+from games.chess.transposition import EXACT, LOWER_BOUND, UPPER_BOUND
+
+# a mate in n plies scores MATE - n for the side delivering it
+MATE = 100000
+INFINITY = MATE + 1
+
+# scores beyond this are mates, which are stored in the transposition table
+# relative to the node rather than the root
+MATE_BOUND = MATE - 1000
+
+# a win known from an endgame bitbase scores this plus the static evaluation,
+# which still tells better won positions apart
+KNOWN_WIN = 20000
+
+# how many nodes are searched between checks of the clock
+CHECK_INTERVAL = 1024
+
+# the deepest ply the search keeps killer moves for
+MAX_PLY = 128
+
+# move ordering scores: the hash move, then captures and promotions by
+# MVV-LVA, then the two killer moves, then captures losing material by
+# static exchange evaluation, then quiet moves by history
+HASH_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORE = 1 << 27
+LOSING_CAPTURE_SCORE = 1 << 26
+
+# history scores are halved once one grows past this, keeping them below
+# the killers and letting newer cutoffs count for more
+HISTORY_MAX = 1 << 20
+
+# null move pruning searches a pass this many plies shallower than a move,
+# or one more ply shallower from NULL_MOVE_DEEP_DEPTH on
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP_DEPTH = 7
+NULL_MOVE_MIN_DEPTH = 3
+
+# late move reductions search quiet moves ordered after this many moves one
+# ply shallower, or two plies shallower from LMR_DEEP_MOVES on
+LMR_MIN_MOVES = 3
+LMR_DEEP_MOVES = 8
+LMR_MIN_DEPTH = 3
+
+# the searcher options switching each selectivity technique, and bitbase
+# cutoffs, on or off
+TECHNIQUES = ("null_move", "lmr", "pvs", "aspiration", "bitbase")
+
+# the half width of the root's window around the last iteration's score
+ASPIRATION_WINDOW = 50
+
+# quiescence skips captures that can't raise alpha even when winning the
+# captured piece by this much more than its value
+DELTA_MARGIN = 200
+
+
+class Searcher:
+    """Negamax alpha-beta search with iterative deepening over a local board."""
+
+    def __init__(self, board, tt, capture_gen=True, null_move=True, lmr=True,
+                 pvs=True, aspiration=True, bitbase=True, pawns=None):
+        """Initializes a searcher.
+
+        Args:
+            board: The board to search. It is searched with make_move and
+                unmake_move, and is left as it was found.
+            tt: The transposition table to use.
+            capture_gen: If False, quiescence search generates every move and
+                filters out the quiet ones instead of generating only
+                captures and promotions, for benchmarking.
+            null_move: If True, prune nodes where passing still fails high.
+            lmr: If True, search late quiet moves with reduced depth.
+            pvs: If True, search moves after the first with a null window.
+            aspiration: If True, search the root with a narrow window around
+                the last iteration's score.
+            bitbase: If True, score positions covered by an endgame bitbase
+                without searching them.
+            pawns: The PawnTable to evaluate with, or None for a new one.
+
+        Returns:
+            A searcher ready to search board.
+        """
+
+        self.board = board
+        self.tt = tt
+        self.pawns = PawnTable() if pawns is None else pawns
+        self.capture_gen = capture_gen
+        self.null_move = null_move
+        self.lmr = lmr
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.bitbase = bitbase
+
+        # once the root is in a bitbase every position is, and known wins
+        # have to be searched to find the way to mate
+        self._root_in_bitbase = (bitbase and board.phase <= MAX_BITBASE_PHASE
+                                 and probe(board) is not None)
+
+        # statistics from the last search, where nodes include quiescence
+        # nodes and qmoves counts the moves generated by quiescence search
+        self.nodes = 0
+        self.qnodes = 0
+        self.qmoves = 0
+        self.depth = 0
+        self.score = 0
+        self.elapsed = 0.0
+        self.best_move = None
+
+        # how often a beta cutoff came from the first move searched, which
+        # measures how well moves are ordered
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+        # two quiet moves per ply that recently caused a cutoff, and a
+        # butterfly table of cutoff counts indexed by color and from-to
+        # squares
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]
+
+        self._stop_time = 0.0
+        self._soft_time = 0.0
+        self._stopped = False
+
+    def search(self, time_limit, max_depth=64, soft_limit=None, start_depth=1):
+        """Searches the board by iterative deepening.
+
+        Args:
+            time_limit: The number of seconds the search may run for. The
+                search stops outright once it is reached. If None, the
+                limits already set by set_time_limit are kept, so another
+                thread can set them without racing the search's start.
+            max_depth: The deepest iteration to search to.
+            soft_limit: If set, no new iteration is started after this many
+                seconds.
+            start_depth: The first iteration to search. Parallel helpers
+                start deeper so they don't all search the same tree.
+
+        Returns:
+            (int|None): The best packed move found by the last iteration to
+                finish, or None if the side to move has no legal moves.
+        """
+
+        start = time()
+        if time_limit is not None:
+            self.set_time_limit(time_limit, soft_limit)
+
+        self.nodes = 0
+        self.qnodes = 0
+        self.qmoves = 0
+        self.depth = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+        board = self.board
+        moves = list(generate_legal_moves(board, int(board.turn == 'b')))
+        best_move = self.best_move = moves[0] if moves else None
+
+        for depth in range(start_depth, max_depth + 1):
+            if not moves:
+                break
+
+            alpha, beta = -INFINITY, INFINITY
+
+            if self.aspiration and self.depth and abs(self.score) < MATE_BOUND:
+                alpha = self.score - ASPIRATION_WINDOW
+                beta = self.score + ASPIRATION_WINDOW
+
+            while True:
+                score, move = self._search_root(depth, moves, alpha, beta)
+
+                # a score outside the window is only a bound, so search again
+                # with that side of the window opened up
+                if self._stopped:
+                    break
+                elif score <= alpha:
+                    alpha = -INFINITY
+                elif score >= beta:
+                    beta = INFINITY
+                else:
+                    break
+
+            # an unfinished iteration can't be trusted, keep the last result
+            if self._stopped:
+                break
+
+            best_move, self.score, self.depth = move, score, depth
+            self.best_move = best_move
+
+            # search the best move first in the next iteration
+            moves.remove(move)
+            moves.insert(0, move)
+
+            # a forced move or a found mate won't change with more depth
+            if abs(score) > MATE_BOUND or len(moves) == 1:
+                break
+
+            if time() >= self._soft_time:
+                break
+
+        self.elapsed = time() - start
+        self._stopped = False
+
+        return best_move
+
+    def set_time_limit(self, time_limit, soft_limit=None):
+        """Sets the time limits of a search, counted from now.
+
+        May be called from another thread while a search is running, e.g. to
+        turn an open ended ponder search into a timed one, or before it
+        starts if search is then given no time limit of its own.
+
+        Args:
+            time_limit: The number of seconds until the search stops outright.
+            soft_limit: If set, no new iteration is started after this many
+                seconds.
+        """
+
+        now = time()
+        self._stop_time = now + time_limit
+        self._soft_time = now + (time_limit if soft_limit is None else soft_limit)
+
+    def stop(self):
+        """Stops the search as soon as possible.
+
+        May be called from another thread. The search keeps the result of the
+        last iteration it finished, and a stop made before the search starts
+        applies to it.
+        """
+
+        self._stopped = True
+
+    @property
+    def nps(self):
+        """int: Nodes searched per second by the last search."""
+
+        return int(self.nodes / self.elapsed) if self.elapsed else 0
+
+    @property
+    def ponder_move(self):
+        """(int|None): The reply the last search expects to its best move."""
+
+        return expected_reply(self.board, self.tt, self.best_move)
+
+    @property
+    def first_move_cutoff_rate(self):
+        """float: The fraction of beta cutoffs caused by the first move."""
+
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def stopped(self):
+        """bool: True if the current search ran out of time or was stopped."""
+
+        return self._stopped
+
+    def report(self):
+        """Prints the statistics of the last search."""
+
+        print("Searched {} nodes to depth {} in {:.2f}s ({} nodes/sec)".format(
+            self.nodes, self.depth, self.elapsed, self.nps))
+        print("Pawn hash hit rate {:.1%}".format(self.pawns.hit_rate))
+
+    def search_move(self, move, depth, alpha, beta):
+        """Searches a single root move to a fixed depth.
+
+        Used to split the root moves between processes. The time limit is
+        set beforehand with set_time_limit.
+
+        Args:
+            move: The packed root move to search.
+            depth: The depth to search to, including the root move.
+            alpha: The lower bound of the search window.
+            beta: The upper bound of the search window.
+
+        Returns:
+            int: The move's score from the side to move's point of view,
+                which is meaningless if the search was stopped.
+        """
+
+        board = self.board
+
+        undo = board.make_move(move)
+        score = -self._negamax(depth - 1, -beta, -alpha, 1)
+        board.unmake_move(undo)
+
+        return score
+
+    def _search_root(self, depth, moves, alpha, beta):
+        board = self.board
+        alpha_original = alpha
+        best_score, best_move = -INFINITY, moves[0]
+
+        for i, move in enumerate(moves):
+            undo = board.make_move(move)
+
+            if i == 0 or not self.pvs:
+                score = -self._negamax(depth - 1, -beta, -alpha, 1)
+            else:
+                score = -self._negamax(depth - 1, -alpha - 1, -alpha, 1)
+
+                if alpha < score < beta:
+                    score = -self._negamax(depth - 1, -beta, -alpha, 1)
+
+            board.unmake_move(undo)
+
+            if self._stopped:
+                break
+
+            if score > best_score:
+                best_score, best_move = score, move
+
+                if score > alpha:
+                    alpha = score
+
+                    if alpha >= beta:
+                        break
+
+        if not self._stopped:
+            self.tt.store(board.key, depth, best_score,
+                          _bound(best_score, alpha_original, beta), best_move)
+
+        return best_score, best_move
+
+    def _negamax(self, depth, alpha, beta, ply, allow_null=True):
+        if depth <= 0:
+            return self._quiesce(alpha, beta, ply)
+
+        board = self.board
+        self.nodes += 1
+
+        if self.nodes % CHECK_INTERVAL == 0 and time() > self._stop_time:
+            self._stopped = True
+
+        if self._stopped:
+            return 0
+
+        if board.is_draw():
+            return 0
+
+        if self.bitbase and board.phase <= MAX_BITBASE_PHASE:
+            result = probe(board)
+
+            if result == DRAW:
+                return 0
+
+            if result and not self._root_in_bitbase:
+                return result * KNOWN_WIN + evaluate(board, self.pawns)
+
+        alpha_original = alpha
+        hash_move = 0
+        entry = self.tt.probe(board.key)
+
+        if entry:
+            entry_depth, score, bound, hash_move = entry
+
+            if entry_depth >= depth:
+                score = _score_from_tt(score, ply)
+
+                if (bound == EXACT
+                        or (bound == LOWER_BOUND and score >= beta)
+                        or (bound == UPPER_BOUND and score <= alpha)):
+                    return score
+
+        color = int(board.turn == 'b')
+        pieces = board.bitboards[color]
+        in_check = self._in_check()
+
+        # null move pruning: if passing still fails high, a real move would
+        # too; a side with only pawns is skipped as it's often in zugzwang,
+        # where passing would be its best move
+        if (self.null_move and allow_null and not in_check
+                and depth >= NULL_MOVE_MIN_DEPTH and beta < MATE_BOUND
+                and pieces[KNIGHT] | pieces[BISHOP] | pieces[ROOK] | pieces[QUEEN]):
+            reduction = NULL_MOVE_REDUCTION + (depth >= NULL_MOVE_DEEP_DEPTH)
+
+            undo = board.make_null_move()
+            score = -self._negamax(depth - 1 - reduction, -beta, -beta + 1, ply + 1, False)
+            board.unmake_null_move(undo)
+
+            if self._stopped:
+                return 0
+
+            if score >= beta:
+                # a mate found after passing isn't a real mate
+                return beta if score > MATE_BOUND else score
+
+        moves = generate_legal_moves(board, color)
+
+        # no legal moves is either checkmate or stalemate
+        if not moves:
+            return -MATE + ply if in_check else 0
+
+        best_score = -INFINITY
+        best_move = 0
+
+        for i, (order, move) in enumerate(self._order_moves(moves, hash_move, ply)):
+            undo = board.make_move(move)
+
+            if i == 0:
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # late move reductions: quiet moves the ordering put late are
+                # unlikely to be best, so search them shallower unless they
+                # give check
+                reduction = 0
+
+                if (self.lmr and i >= LMR_MIN_MOVES and depth >= LMR_MIN_DEPTH
+                        and order < LOSING_CAPTURE_SCORE and not in_check
+                        and not self._in_check()):
+                    reduction = 1 + (i >= LMR_DEEP_MOVES)
+
+                # principal variation search: after the first move, only
+                # show a move is no better than alpha, with a null window
+                window = alpha + 1 if self.pvs else beta
+
+                score = -self._negamax(depth - 1 - reduction, -window, -alpha, ply + 1)
+
+                if reduction and score > alpha:
+                    score = -self._negamax(depth - 1, -window, -alpha, ply + 1)
+
+                if window < beta and alpha < score < beta:
+                    score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+
+            board.unmake_move(undo)
+
+            if self._stopped:
+                return 0
+
+            if score > best_score:
+                best_score, best_move = score, move
+
+                if score > alpha:
+                    alpha = score
+
+                    if alpha >= beta:
+                        self._cutoff(move, i, depth, ply, color)
+                        break
+
+        self.tt.store(board.key, depth, _score_to_tt(best_score, ply),
+                      _bound(best_score, alpha_original, beta), best_move)
+
+        return best_score
+
+    def _order_moves(self, moves, hash_move, ply):
+        """Sorts moves so those likeliest to cause a cutoff come first.
+
+        Args:
+            moves: The packed moves to sort.
+            hash_move: The transposition table's best move, or 0.
+            ply: The distance from the root, for the killer moves.
+
+        Returns:
+            list: The moves as (ordering score, move) tuples, best first.
+        """
+
+        board = self.board
+        color = int(board.turn == 'b')
+        enemy = board.occupancy[color ^ 1]
+        killer_1, killer_2 = self.killers[ply] if ply < MAX_PLY else (0, 0)
+        history = self.history[color]
+        scored = []
+
+        for move in moves:
+            if move == hash_move:
+                score = HASH_SCORE
+            elif enemy >> (move >> 6 & 63) & 1 or move >> 12 >= EN_PASSANT:
+                score = self._capture_score(move)
+            elif move == killer_1:
+                score = KILLER_SCORE + 1
+            elif move == killer_2:
+                score = KILLER_SCORE
+            else:
+                score = history[move & 0xFFF]
+
+            scored.append((score, move))
+
+        scored.sort(reverse=True)
+
+        return scored
+
+    def _capture_score(self, move):
+        """Scores a capture or promotion for move ordering.
+
+        Args:
+            move: The packed capture or promotion.
+
+        Returns:
+            int: The ordering score, below the killers if the capture loses
+                material.
+        """
+
+        gain, attacker = self._mvv_lva(move)
+        key = gain * 8 - attacker
+
+        # taking a piece worth at least the attacker can't lose material,
+        # so only the rest need a static exchange evaluation
+        if gain < MG_VALUES[attacker] and see(self.board, move) < 0:
+            return LOSING_CAPTURE_SCORE + key
+
+        return CAPTURE_SCORE + key
+
+    def _mvv_lva(self, move):
+        """Scores a capture or promotion by most valuable victim, least
+        valuable attacker.
+
+        Args:
+            move: The packed capture or promotion.
+
+        Returns:
+            (int, int): The material gained and the attacker's type code.
+                Sorting by gain * 8 - attacker puts bigger gains first, and
+                cheaper attackers first among equal gains.
+        """
+
+        board = self.board
+        to, flag = move >> 6 & 63, move >> 12
+        victim = board.get_piece(to & 7, to >> 3)
+        attacker = board.get_piece(move & 7, move >> 3 & 7).type_code
+
+        if victim:
+            gain = MG_VALUES[victim.type_code]
+        elif flag == EN_PASSANT:
+            gain = MG_VALUES[PAWN]
+        else:
+            gain = 0
+
+        if flag >= PROMOTION:
+            gain += MG_VALUES[KNIGHT + flag - PROMOTION] - MG_VALUES[PAWN]
+
+        return gain, attacker
+
+    def _cutoff(self, move, index, depth, ply, color):
+        """Records a beta cutoff in the statistics and ordering heuristics.
+
+        Args:
+            move: The move that caused the cutoff.
+            index: The move's position in the ordered move list.
+            depth: The remaining depth of the node.
+            ply: The distance from the root.
+            color: The color code of the side that moved.
+        """
+
+        self.cutoffs += 1
+
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        # only quiet moves are remembered, captures are already tried early
+        board = self.board
+        if board.get_piece((move >> 6) & 7, move >> 9 & 7) or move >> 12 >= EN_PASSANT:
+            return
+
+        killers = self.killers[ply] if ply < MAX_PLY else None
+        if killers and killers[0] != move:
+            killers[1], killers[0] = killers[0], move
+
+        history = self.history[color]
+        history[move & 0xFFF] += depth * depth
+
+        if history[move & 0xFFF] > HISTORY_MAX:
+            self.history[color] = [value // 2 for value in history]
+
+    def _quiesce(self, alpha, beta, ply):
+        """Searches captures and promotions until the position is quiet.
+
+        The side to move may stand pat on the static evaluation rather than
+        capture, unless it is in check, where every evasion is searched.
+
+        Args:
+            alpha: The lower bound of the search window.
+            beta: The upper bound of the search window.
+            ply: The distance from the root.
+
+        Returns:
+            int: The score from the side to move's point of view.
+        """
+
+        board = self.board
+        color = int(board.turn == 'b')
+
+        self.nodes += 1
+        self.qnodes += 1
+
+        if self.nodes % CHECK_INTERVAL == 0 and time() > self._stop_time:
+            self._stopped = True
+
+        if self._stopped:
+            return 0
+
+        result = None
+        if self.bitbase and board.phase <= MAX_BITBASE_PHASE:
+            result = probe(board)
+
+            # bitbase draws include stalemates, but never a mate
+            if result == DRAW:
+                return 0
+
+        in_check = self._in_check()
+
+        if in_check:
+            moves = generate_legal_moves(board, color)
+            self.qmoves += len(moves)
+
+            if not moves:
+                return -MATE + ply
+
+            best_score = stand_pat = -INFINITY
+        else:
+            stand_pat = evaluate(board, self.pawns)
+
+            # a known result leaves nothing for captures to resolve; only
+            # evasions are searched, so a mate still scores as one
+            if result:
+                return result * KNOWN_WIN + stand_pat
+
+            if stand_pat >= beta:
+                return stand_pat
+
+            if stand_pat > alpha:
+                alpha = stand_pat
+
+            best_score = stand_pat
+
+            if self.capture_gen:
+                moves = generate_legal_moves(board, color, True)
+                self.qmoves += len(moves)
+            else:
+                moves = generate_legal_moves(board, color)
+                self.qmoves += len(moves)
+
+                enemy = board.occupancy[color ^ 1]
+                moves = [move for move in moves
+                         if enemy >> (move >> 6 & 63) & 1 or move >> 12 >= PROMOTION
+                         or move >> 12 == EN_PASSANT]
+
+        # try the biggest gains first, and among them the cheapest attackers
+        captures = []
+
+        for move in moves:
+            gain, attacker = self._mvv_lva(move)
+            captures.append((gain * 8 - attacker, gain, attacker, move))
+
+        captures.sort(reverse=True)
+
+        for _, gain, attacker, move in captures:
+            # delta pruning: skip captures that can't bring the score up to
+            # alpha even with a positional bonus on top
+            if not in_check and stand_pat + gain + DELTA_MARGIN <= alpha:
+                break
+
+            # skip captures that lose material in the exchange, checking
+            # only those taking something cheaper than the attacker
+            if not in_check and gain < MG_VALUES[attacker] and see(board, move) < 0:
+                continue
+
+            undo = board.make_move(move)
+            score = -self._quiesce(-beta, -alpha, ply + 1)
+            board.unmake_move(undo)
+
+            if self._stopped:
+                return 0
+
+            if score > best_score:
+                best_score = score
+
+                if score > alpha:
+                    alpha = score
+
+                    if alpha >= beta:
+                        break
+
+        return best_score
+
+    def _in_check(self):
+        """Checks if the side to move is in check.
+
+        Returns:
+            bool: True if the side to move's king is attacked, False otherwise.
+        """
+
+        board = self.board
+        color = int(board.turn == 'b')
+        king = board.bitboards[color][KING].bit_length() - 1
+
+        return is_attacked(board, king, color ^ 1)
+
+
+def expected_reply(board, tt, move):
+    """Gets the reply a search expects to a move, its hash move after it.
+
+    Args:
+        board: The board the move is played on, left as it was found.
+        tt: The transposition table the search stored its results in.
+        move: The packed move, or None.
+
+    Returns:
+        (int|None): The packed reply, which may not be legal if the entry
+            was overwritten by another position, or None if there is none.
+    """
+
+    if move is None:
+        return None
+
+    undo = board.make_move(move)
+    entry = tt.probe(board.key)
+    board.unmake_move(undo)
+
+    return entry[3] if entry else None
+
+
+def _bound(score, alpha, beta):
+    # how a score searched with the window alpha, beta relates to the true score
+    if score <= alpha:
+        return UPPER_BOUND
+    if score >= beta:
+        return LOWER_BOUND
+    return EXACT
+
+
+def _score_to_tt(score, ply):
+    # store mate scores as distance from this node rather than from the root
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
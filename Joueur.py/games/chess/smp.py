@@ -0,0 +1,274 @@
+from multiprocessing import Event, Process, Queue
+from multiprocessing.shared_memory import SharedMemory
+from threading import Thread
+from time import time
+
+from games.chess.board import Board
+from games.chess.pawns import PawnTable
+from games.chess.search import Searcher, expected_reply
+from games.chess.transposition import TranspositionTable, table_bytes
+
+
+class ParallelSearcher:
+    """The time limits, statistics and reporting shared by the
+    multi-process searchers.
+
+    Like a Searcher, a parallel search can be given a new time limit or
+    stopped from another thread, which is how the AI ponders with every
+    process.
+    """
+
+    def __init__(self, threads, options=None):
+        """Initializes the statistics of a parallel searcher.
+
+        Args:
+            threads: The number of searching processes.
+            options: Keyword arguments passed on to every Searcher.
+
+        Returns:
+            A parallel searcher that hasn't searched yet.
+        """
+
+        self.threads = threads
+        self.options = options or {}
+
+        # statistics from the last search
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.elapsed = 0.0
+        self.best_move = None
+        self.worker_nodes = []
+
+        # the reply expected to the best move, for pondering
+        self.ponder_move = None
+
+        self._stop_time = 0.0
+        self._soft_time = 0.0
+        self._stopped = False
+
+    def set_time_limit(self, time_limit, soft_limit=None):
+        """Sets the time limits of a search, counted from now.
+
+        May be called from another thread while a search is running, or
+        before it starts if search is then given no time limit of its own.
+
+        Args:
+            time_limit: The number of seconds until the search stops outright.
+            soft_limit: If set, no new iteration is started after this many
+                seconds.
+        """
+
+        now = time()
+        self._stop_time = now + time_limit
+        self._soft_time = now + (time_limit if soft_limit is None else soft_limit)
+        self._limits_changed()
+
+    def stop(self):
+        """Stops the search as soon as possible.
+
+        May be called from another thread, and a stop made before the search
+        starts applies to it.
+        """
+
+        self._stopped = True
+        self._limits_changed()
+
+    def _limits_changed(self):
+        # passes new limits on to a search already underway
+        pass
+
+    @property
+    def nps(self):
+        """int: Nodes searched per second by all processes in the last search."""
+
+        return int(self.nodes / self.elapsed) if self.elapsed else 0
+
+    def report(self):
+        """Prints the statistics of the last search and its scaling as nodes
+        per second per worker."""
+
+        print("Searched {} nodes to depth {} in {:.2f}s ({} nodes/sec)".format(
+            self.nodes, self.depth, self.elapsed, self.nps))
+
+        rates = ", ".join(str(int(nodes / self.elapsed)) if self.elapsed else "0"
+                          for nodes in self.worker_nodes)
+
+        print("{} workers searched {} nodes/sec, {} per worker ({})".format(
+            self.threads, self.nps, self.nps // self.threads, rates))
+
+
+class LazySMP(ParallelSearcher):
+    """Lazy SMP: several processes search the same root over one shared
+    transposition table.
+
+    The main process searches as usual while each helper process searches
+    the same position from a different starting depth. Helpers speed the
+    main search up only through the results they leave in the shared table,
+    so no other communication is needed while searching.
+    """
+
+    def __init__(self, threads, size_mb=16, options=None):
+        """Initializes the shared table and starts the helper processes.
+
+        Args:
+            threads: The total number of searching processes, including the
+                main one.
+            size_mb: The shared transposition table's size in megabytes.
+            options: Keyword arguments passed on to every Searcher.
+
+        Returns:
+            A parallel searcher with threads - 1 idle helpers.
+        """
+
+        ParallelSearcher.__init__(self, threads, options)
+        self._shm = SharedMemory(create=True, size=table_bytes(size_mb))
+        self.tt = TranspositionTable(size_mb, self._shm.buf)
+        self.tt.clear()
+
+        # pawn structure is cached per process, the main one keeping its
+        # table between searches
+        self.pawns = PawnTable()
+
+        # the main process's search, while one is running
+        self._searcher = None
+
+        self._stop = Event()
+        self._results = Queue()
+        self._jobs = []
+        self._helpers = []
+
+        for index in range(1, threads):
+            jobs = Queue()
+            helper = Process(target=_helper, args=(index, self._shm, size_mb, self.options,
+                                                   jobs, self._results, self._stop))
+            helper.daemon = True
+            helper.start()
+
+            self._jobs.append(jobs)
+            self._helpers.append(helper)
+
+    def search(self, board, time_limit, soft_limit=None):
+        """Searches the board with every process until the main one finishes.
+
+        Args:
+            board: The board to search.
+            time_limit: The number of seconds the search may run for. If
+                None, the limits already set by set_time_limit are kept.
+            soft_limit: If set, no new iteration is started after this many
+                seconds.
+
+        Returns:
+            (int|None): The best packed move found, or None if the side to
+                move has no legal moves.
+        """
+
+        start = time()
+        if time_limit is not None:
+            self.set_time_limit(time_limit, soft_limit)
+
+        self._stop.clear()
+
+        # age out entries from earlier searches
+        self.tt.new_search()
+
+        # helpers need the earlier positions to see repetitions, and search
+        # until the main search finishes
+        job = (board.position(), self.tt.age)
+        for jobs in self._jobs:
+            jobs.put(job)
+
+        searcher = self._searcher = Searcher(board, self.tt, pawns=self.pawns, **self.options)
+        self._limits_changed()
+
+        self.best_move = searcher.search(None)
+        self.depth, self.score = searcher.depth, searcher.score
+        self.worker_nodes = [searcher.nodes]
+        self._searcher = None
+
+        # the helpers only help while the main search runs
+        self._stop.set()
+
+        for _ in self._helpers:
+            move, depth, score, nodes = self._results.get()
+            self.worker_nodes.append(nodes)
+
+            # a helper that finished a deeper iteration knows better
+            if move is not None and depth > self.depth:
+                self.best_move, self.depth, self.score = move, depth, score
+
+        self.nodes = sum(self.worker_nodes)
+        self.elapsed = time() - start
+        self.ponder_move = expected_reply(board, self.tt, self.best_move)
+        self._stopped = False
+
+        return self.best_move
+
+    def _limits_changed(self):
+        searcher = self._searcher
+
+        if searcher:
+            now = time()
+            searcher.set_time_limit(self._stop_time - now, self._soft_time - now)
+
+            if self._stopped:
+                searcher.stop()
+
+    def close(self):
+        """Stops the helper processes and frees the shared table."""
+
+        for jobs in self._jobs:
+            jobs.put(None)
+
+        for helper in self._helpers:
+            helper.join()
+
+        self._helpers = []
+        self._jobs = []
+
+        # views into shared memory must be released before it can be closed
+        self.tt.release()
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _helper(index, shm, size_mb, options, jobs, results, stop):
+    tt = TranspositionTable(size_mb, shm.buf)
+    pawns = PawnTable()
+
+    # odd helpers skip an iteration so they are searching a different depth
+    # to the main process most of the time
+    start_depth = 1 + index % 2
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+
+        position, tt.age = job
+
+        board = Board.from_position(position)
+        searcher = Searcher(board, tt, pawns=pawns, **options)
+
+        # wait for the main search to finish on a thread, as the search
+        # itself only watches its own stop flag
+        Thread(target=stop_on, args=(stop, searcher), daemon=True).start()
+
+        move = searcher.search(float("inf"), start_depth=start_depth)
+        results.put((move, searcher.depth, searcher.score, searcher.nodes))
+
+    # the block is left mapped, as a forked helper holds copies of the main
+    # process's views of it, and is unmapped when the helper exits
+    tt.release()
+
+
+def stop_on(event, searcher):
+    """Stops a search once an event is set, for running on its own thread.
+
+    Args:
+        event: The multiprocessing event to wait for.
+        searcher: The Searcher to stop.
+    """
+
+    event.wait()
+    searcher.stop()
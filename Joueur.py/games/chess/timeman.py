@@ -0,0 +1,74 @@
+from games.chess.bitboard import generate_legal_moves
+
+# how many more moves to budget for when the end of the game is far away
+MOVES_TO_GO = 30
+
+# seconds held back each move for network and client overhead
+OVERHEAD = 0.1
+
+# a typical number of legal moves, positions with more get more time
+AVERAGE_MOVES = 30
+
+# the hard limit may run this many times past the soft limit
+HARD_RATIO = 4.0
+
+# the hard limit never spends more than this fraction of the clock
+MAX_FRACTION = 0.25
+
+
+class TimeManager:
+    """Budgets per-move search time from the player's remaining clock."""
+
+    def __init__(self, increment=0.0, moves_to_go=None, overhead=OVERHEAD):
+        """Initializes a time manager.
+
+        Args:
+            increment: Seconds added to our clock after each move.
+            moves_to_go: Moves to budget the clock over, or None to estimate
+                it from how many turns the game has left.
+            overhead: Seconds held back each move for network and client lag.
+
+        Returns:
+            A time manager ready to allocate time.
+        """
+
+        self.increment = increment
+        self.moves_to_go = moves_to_go
+        self.overhead = overhead
+
+    def allocate(self, player, game, board):
+        """Allocates soft and hard time limits for the next move.
+
+        The search should not start a new iteration after the soft limit and
+        must stop outright at the hard limit.
+
+        Args:
+            player: The synced server Player whose clock is being spent.
+            game: The synced server Game, used to estimate moves to go.
+            board: The local board about to be searched.
+
+        Returns:
+            (float, float): The soft and hard limits in seconds.
+        """
+
+        # the server keeps our clock in nanoseconds
+        remaining = max(player.time_remaining / 1e9 - self.overhead, 0.0)
+
+        moves_to_go = self.moves_to_go
+        if not moves_to_go:
+            # each of our moves is two of the game's turns
+            turns_left = game.max_turns - game.current_turn
+            moves_to_go = max(1, min(MOVES_TO_GO, turns_left // 2))
+
+        # spend longer on positions with more choices to consider
+        legal_moves = len(generate_legal_moves(board, int(board.turn == 'b')))
+        complexity = min(max(legal_moves / AVERAGE_MOVES, 0.5), 1.5)
+
+        soft = (remaining / moves_to_go + self.increment * 0.75) * complexity
+        hard = min(soft * HARD_RATIO, remaining * MAX_FRACTION + self.increment * 0.75)
+
+        # never plan to spend more than is actually on the clock
+        hard = min(hard, remaining)
+        soft = min(soft, hard)
+
+        return soft, hard
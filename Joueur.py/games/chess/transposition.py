@@ -0,0 +1,180 @@
+from array import array
+
+# bound types, describing how a stored score relates to the true score
+EXACT, LOWER_BOUND, UPPER_BOUND = range(3)
+
+# each entry is a key and a packed data word, 16 bytes in total
+ENTRY_SIZE = 16
+
+# entries per bucket: a depth-preferred slot followed by an always-replace slot
+BUCKET_SIZE = 2
+
+# ages wrap around so they fit in the 6 bits reserved for them
+AGE_MASK = 0x3F
+
+# scores are stored offset into an unsigned 32-bit field
+SCORE_OFFSET = 1 << 31
+
+
+def _bucket_count(size_mb):
+    buckets = max(1, size_mb * (1 << 20) // (ENTRY_SIZE * BUCKET_SIZE))
+
+    # round down to a power of two so keys can be masked
+    return 1 << (buckets.bit_length() - 1)
+
+
+def table_bytes(size_mb):
+    """Gets the number of bytes a table actually uses.
+
+    Args:
+        size_mb: The table's memory budget in megabytes.
+
+    Returns:
+        int: The size of buffer to allocate for a table sharing memory.
+    """
+
+    return _bucket_count(size_mb) * BUCKET_SIZE * ENTRY_SIZE
+
+
+class TranspositionTable:
+    """A fixed-size hash table of search results keyed by zobrist key.
+
+    Entries live in two flat arrays rather than as objects: one of 64-bit
+    keys and one of 64-bit data words, each packing the best move (16 bits),
+    depth (8 bits), bound type (2 bits), age (6 bits) and score (32 bits).
+
+    Keys are stored XORed with their data word, so an entry torn by another
+    process writing the same slot fails to match instead of returning a
+    mix of two results.
+    """
+
+    def __init__(self, size_mb=16, buffer=None):
+        """Initializes a transposition table.
+
+        Args:
+            size_mb: The memory budget in megabytes. The number of buckets is
+                rounded down to a power of two so keys can be masked.
+            buffer: If set, a writable buffer of at least table_bytes(size_mb)
+                bytes, such as a multiprocessing shared memory block, to keep
+                the entries in. It is used as is rather than cleared, so
+                tables in several processes can share it.
+
+        Returns:
+            A transposition table.
+        """
+
+        buckets = _bucket_count(size_mb)
+
+        self.size = buckets * BUCKET_SIZE
+        self._mask = buckets - 1
+        self.age = 0
+
+        if buffer is None:
+            self._buffer = None
+            self.clear()
+        else:
+            self._buffer = memoryview(buffer)[:self.size * ENTRY_SIZE]
+            words = self._buffer.cast('Q')
+            self._keys = words[:self.size]
+            self._data = words[self.size:]
+
+    def clear(self):
+        """Removes every entry from the table."""
+
+        if self._buffer is None:
+            self._keys = array('Q', bytes(self.size * 8))
+            self._data = array('Q', bytes(self.size * 8))
+        else:
+            self._buffer[:] = bytes(len(self._buffer))
+
+    def release(self):
+        """Lets go of a shared buffer so its owner can free it.
+
+        The table can't be used afterwards.
+        """
+
+        if self._buffer is not None:
+            self._keys.release()
+            self._data.release()
+            self._buffer.release()
+
+    def new_search(self):
+        """Advances the table's age.
+
+        Called once per move of the game so entries left over from earlier
+        searches are replaced before ones from the current search.
+        """
+
+        self.age = (self.age + 1) & AGE_MASK
+
+    def probe(self, key):
+        """Looks up a position.
+
+        Args:
+            key: The position's zobrist key.
+
+        Returns:
+            (int, int, int, int)|None: The depth, score, bound type and best
+                move stored for the position, or None if it isn't stored.
+        """
+
+        index = (key & self._mask) * BUCKET_SIZE
+        keys = self._keys
+        data = self._data[index]
+
+        if keys[index] ^ data != key:
+            index += 1
+            data = self._data[index]
+
+            if keys[index] ^ data != key:
+                return None
+
+        return ((data >> 16) & 0xFF,
+                (data >> 32) - SCORE_OFFSET,
+                (data >> 24) & 0x3,
+                data & 0xFFFF)
+
+    def store(self, key, depth, score, bound, move):
+        """Stores a search result.
+
+        The depth-preferred slot is replaced when it holds the same position,
+        an entry from an earlier search, or a result searched no deeper than
+        this one. Otherwise the result goes in the always-replace slot.
+
+        Args:
+            key: The position's zobrist key.
+            depth: The remaining depth the position was searched to.
+            score: The score, which must fit in a signed 32-bit integer.
+            bound: EXACT, LOWER_BOUND or UPPER_BOUND.
+            move: The best move packed into 16 bits, or 0 if there is none.
+        """
+
+        index = (key & self._mask) * BUCKET_SIZE
+        stored = self._data[index]
+
+        if (self._keys[index] ^ stored != key
+                and ((stored >> 26) & AGE_MASK) == self.age
+                and ((stored >> 16) & 0xFF) > depth):
+            index += 1
+
+        data = (move
+                | max(0, min(depth, 0xFF)) << 16
+                | bound << 24
+                | self.age << 26
+                | (score + SCORE_OFFSET) << 32)
+
+        self._data[index] = data
+        self._keys[index] = key ^ data
+
+    def hashfull(self):
+        """Estimates how full the table is from a sample of its first entries.
+
+        Returns:
+            int: The permille of sampled slots used by the current search.
+        """
+
+        sample = min(self.size, 1000)
+        used = sum(1 for i in range(sample)
+                   if self._data[i] and (self._data[i] >> 26) & AGE_MASK == self.age)
+
+        return used * 1000 // sample
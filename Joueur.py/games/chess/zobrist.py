@@ -0,0 +1,59 @@
+"""Zobrist keys for hashing local board positions.
+
+A position's key is the XOR of one random 64-bit number per (color, piece
+type, square) in the position, plus numbers for each castling right, the
+en passant file and black to move. Keys are generated from a fixed seed so
+they are the same across runs and processes.
+"""
+
+from random import Random
+
+_random = Random(0x5A0B1257)
+
+# piece keys indexed by color code, piece type code and square
+PIECE_KEYS = tuple(
+    tuple(tuple(_random.getrandbits(64) for sq in range(64)) for type in range(6))
+    for color in range(2))
+
+CASTLING_KEYS = {right: _random.getrandbits(64) for right in "KQkq"}
+
+# en passant keys indexed by file (x coordinate)
+EN_PASSANT_KEYS = tuple(_random.getrandbits(64) for x in range(8))
+
+# XORed in whenever it is black's turn
+SIDE_KEY = _random.getrandbits(64)
+
+
+def castling_key(castling):
+    """Gets the key for a FEN castling field.
+
+    Args:
+        castling: The castling field, e.g. "KQkq" or "-".
+
+    Returns:
+        int: The XOR of the key for every right present.
+    """
+
+    key = 0
+
+    for right in castling:
+        if right in CASTLING_KEYS:
+            key ^= CASTLING_KEYS[right]
+
+    return key
+
+
+def en_passant_key(en_passant):
+    """Gets the key for a FEN en passant field.
+
+    Args:
+        en_passant: The en passant field, e.g. "e3" or "-".
+
+    Returns:
+        int: The key for the en passant file, or 0 if there is none.
+    """
+
+    if en_passant == '-':
+        return 0
+
+    return EN_PASSANT_KEYS[ord(en_passant[0])-97]